@@ -1,13 +1,46 @@
 import os
 import disnake
 from disnake.ext import commands
-import os
+from utils.database import Database
+from utils.router import InteractionRouter
+from utils.schema import ensure_indexes, check_query_plans
 
 TOKEN = os.getenv("TOKEN")
 
 intents = disnake.Intents.all()
 
-bot = commands.Bot(
+
+class AVBot(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Общее подключение к БД для всех когов
+        self.db = Database("dbs/file.db")
+        # Общий маршрутизатор компонентов: коги регистрируют обработчики по custom_id
+        self.router = InteractionRouter()
+
+    async def on_button_click(self, inter):
+        await self.router.dispatch(inter)
+
+    async def on_dropdown(self, inter):
+        await self.router.dispatch(inter)
+
+    async def on_modal_submit(self, inter):
+        await self.router.dispatch(inter)
+
+    async def close(self):
+        # Даём когам завершить фоновую работу, пока БД ещё открыта
+        for cog in list(self.cogs.values()):
+            if hasattr(cog, "shutdown"):
+                try:
+                    await cog.shutdown()
+                except Exception as e:
+                    print(f"❌ Ошибка остановки {cog.__class__.__name__}: {e}")
+
+        await self.db.close()
+        await super().close()
+
+
+bot = AVBot(
     command_prefix=".",
     intents=intents,
     help_command=None
@@ -21,6 +54,8 @@ async def init_all_databases():
 
     print("🔧 Инициализация баз данных...")
 
+    await bot.db.connect()
+
     for cog in bot.cogs.values():
         if hasattr(cog, "init_db"):
             try:
@@ -29,6 +64,13 @@ async def init_all_databases():
             except Exception as e:
                 print(f"❌ Ошибка БД в {cog.__class__.__name__}: {e}")
 
+    # Индексы создаются после таблиц всех когов
+    try:
+        await ensure_indexes(bot.db)
+        await check_query_plans(bot.db)
+    except Exception as e:
+        print(f"❌ Ошибка проверки индексов: {e}")
+
     print("🎉 Все базы инициализированы!\n")
 
 
@@ -1,19 +1,77 @@
 import disnake
 from disnake.ext import commands
-import aiosqlite
+import asyncio
 import datetime
+import time
+from collections import deque
+from utils.database import WriteBehindQueue
+
+# Действия журнала модерации (таблица punishments)
+MODERATION_EMOJIS = {
+    "mute": "🔇",
+    "unmute": "🔊",
+    "kick": "👢",
+    "ban": "🚫",
+    "unban": "✅",
+    "warn": "⚠️",
+    "unwarn": "✅",
+    "clear": "🗑️",
+    "massban": "🚫",
+    "masskick": "👢"
+}
+
+MODERATION_NAMES = {
+    "mute": "Мьют выдан",
+    "unmute": "Мьют снят",
+    "kick": "Кик",
+    "ban": "Бан",
+    "unban": "Разбан",
+    "warn": "Предупреждение",
+    "unwarn": "Снятие предупреждения",
+    "clear": "Очистка сообщений",
+    "massban": "Массовый бан",
+    "masskick": "Массовый кик"
+}
 
 class Logs(commands.Cog):
+    # Записей журнала за один запрос при повторной отправке
+    REPLAY_PAGE_SIZE = 100
+    # Так действия модераторов писались в logs до перехода на журнал punishments
+    LEGACY_MODERATION_ACTIONS = ("mute", "unmute", "kick", "ban", "unban", "warn", "unwarn", "clear", "massban", "masskick")
+    # Записи журнала в формате строк logs (user_id — модератор, как и раньше).
+    # id журнала и logs пересекаются, поэтому последний столбец source говорит, откуда строка
+    JOURNAL_AS_LOGS = """SELECT id, guild_id, moderator_id AS user_id, action_type AS action,
+        replace(time, ' ', 'T') AS timestamp, user_id AS user_actioned_id, reason, duration,
+        NULL AS deleted_message, NULL AS channel_id, moderator_id, NULL AS extra_info,
+        'punishments' AS source FROM punishments"""
+    LOGS_WITH_SOURCE = "SELECT *, 'logs' AS source FROM logs"
+
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
+        # guild_id -> channel_id канала логов
+        self.log_channels = {}
+        # Строки логов пишутся пачками в фоне, а не отдельным commit на каждое событие
+        self.log_queue = WriteBehindQueue(
+            self.db,
+            """INSERT INTO logs (
+                guild_id, user_id, action, timestamp, user_actioned_id, reason,
+                duration, deleted_message, channel_id, moderator_id, extra_info
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            batch_size=500,
+            flush_interval=2.0,
+            max_size=50000,
+            overflow="drop_oldest",
+            name="logs"
+        )
+        # Эмбеды отправляются пачками до 10 штук за сообщение
+        self.dispatcher = LogDispatcher()
+        # ID сообщений, удаляемых /clear по одному: их удаление не логируется отдельно
+        self.ignored_deletes = set()
         self.bot.loop.create_task(self.setup_database())
-        self.path = "dbs/file.db"
 
     async def init_db(self):
-        async with aiosqlite.connect(self.path) as db:
-
-            await db.execute("PRAGMA journal_mode=WAL")
-
+        async with self.db.write() as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS logs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -38,60 +96,73 @@ class Logs(commands.Cog):
                     channel_id INTEGER
                 )
             """)
-            await db.commit()
+
+        # Прогреваем кеш каналов логов одним запросом
+        rows = await self.db.fetchall("SELECT guild_id, channel_id FROM settings WHERE channel_id IS NOT NULL")
+        self.log_channels = {guild_id: channel_id for guild_id, channel_id in rows}
 
     async def setup_database(self):
         await self.init_db()
 
+    async def shutdown(self):
+        # Сначала строки в БД: отправка в канал может упереться в лимиты
+        await self.log_queue.close()
+        await self.dispatcher.close()
+
+    def stats(self):
+        dispatch = self.dispatcher.stats()
+        return {
+            "Очередь записи": len(self.log_queue),
+            "Записано / потеряно строк": f"{self.log_queue.written} / {self.log_queue.dropped}",
+            "Эмбедов в очереди отправки": dispatch['depth'],
+            "Задержка отправки": f"{dispatch['lag']:.1f} с",
+            "Интервал отправки": f"{dispatch['interval']:.1f} с",
+            "Отправлено сообщений / эмбедов": f"{dispatch['messages']} / {dispatch['embeds']}",
+            "Потеряно эмбедов": dispatch['dropped'],
+        }
+
     async def log_action(self, guild_id: int, user_id: int, action: str, user_actioned_id: int = None, 
                         reason: str = None, duration: str = None, deleted_message_text: str = None,
                         channel_id: int = None, moderator_id: int = None, extra_info: str = None):
-        """Универсальная функция логирования"""
+        """Универсальная функция логирования (запись ставится в очередь)"""
         timestamp = datetime.datetime.utcnow().isoformat()
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("""
-                INSERT INTO logs (
-                    guild_id,
-                    user_id, 
-                    action, 
-                    timestamp, 
-                    user_actioned_id, 
-                    reason, 
-                    duration, 
-                    deleted_message,
-                    channel_id,
-                    moderator_id,
-                    extra_info
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (guild_id, user_id, action, timestamp, user_actioned_id, reason, duration, 
-                  deleted_message_text, channel_id, moderator_id, extra_info))
-            await db.commit()
+        self.log_queue.put((guild_id, user_id, action, timestamp, user_actioned_id, reason, duration, 
+                            deleted_message_text, channel_id, moderator_id, extra_info))
 
     async def send_log_embed(self, guild, embed):
         """Отправить лог в канал"""
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute("SELECT channel_id FROM settings WHERE guild_id = ?", (guild.id,))
-            row = await cursor.fetchone()
-            await cursor.close()
-            
-            if row and row[0]:
-                log_channel = guild.get_channel(row[0])
-                if log_channel:
-                    await log_channel.send(embed=embed)
+        channel_id = self.log_channels.get(guild.id)
+        
+        if channel_id:
+            log_channel = guild.get_channel(channel_id)
+            if log_channel:
+                self.dispatcher.put(log_channel, embed)
+
+    def legacy_actions_filter(self):
+        """Условие, отсекающее старые строки модерации из logs, и его параметры"""
+        placeholders = ", ".join("?" * len(self.LEGACY_MODERATION_ACTIONS))
+        return f"action NOT IN ({placeholders})", self.LEGACY_MODERATION_ACTIONS
 
     async def fetch_logs(self, user_id: int):
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute("SELECT * FROM logs WHERE user_id = ?", (user_id,))
-            rows = await cursor.fetchall()
-            await cursor.close()
-            return rows
+        """Логи пользователя; действия модератора берутся из журнала punishments"""
+        await self.log_queue.flush()
+        legacy_filter, legacy_params = self.legacy_actions_filter()
+        return await self.db.fetchall(
+            f"{self.JOURNAL_AS_LOGS} WHERE moderator_id = ? "
+            f"UNION ALL {self.LOGS_WITH_SOURCE} WHERE user_id = ? AND {legacy_filter} "
+            "ORDER BY timestamp",
+            (user_id, user_id, *legacy_params)
+        )
         
     async def fetch_all_logs(self):
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute("SELECT * FROM logs")
-            rows = await cursor.fetchall()
-            await cursor.close()
-            return rows
+        await self.log_queue.flush()
+        legacy_filter, legacy_params = self.legacy_actions_filter()
+        return await self.db.fetchall(
+            f"{self.JOURNAL_AS_LOGS} "
+            f"UNION ALL {self.LOGS_WITH_SOURCE} WHERE {legacy_filter} "
+            "ORDER BY timestamp",
+            legacy_params
+        )
 
     @commands.slash_command(description="Настроить каналы для логгирования")
     @commands.has_permissions(administrator=True)
@@ -99,47 +170,68 @@ class Logs(commands.Cog):
 
         await inter.response.send_message("**🛠️ Сетап логов**\n\n▱▱▱▱▱▱ [0%]")
         
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute("SELECT * FROM settings WHERE guild_id = ?", (inter.guild.id,))
-            existing = await cursor.fetchone()
-            await cursor.close()
-            
-            if existing and existing[1] == 'True':
-                await inter.edit_original_response(content="❌ Логирование уже настроено!")
-                return
+        existing = await self.db.fetchone("SELECT * FROM settings WHERE guild_id = ?", (inter.guild.id,))
+        
+        if existing and existing[1] == 'True':
+            await inter.edit_original_response(content="❌ Логирование уже настроено!")
+            return
 
-            overwrites = {
-    inter.guild.default_role: disnake.PermissionOverwrite(view_channel=False),
-    inter.guild.me: disnake.PermissionOverwrite(view_channel=True),
-}
+        overwrites = {
+            inter.guild.default_role: disnake.PermissionOverwrite(view_channel=False),
+            inter.guild.me: disnake.PermissionOverwrite(view_channel=True),
+        }
 
-            category = await inter.guild.create_category("📋 Логи", overwrites=overwrites)
+        category = await inter.guild.create_category("📋 Логи", overwrites=overwrites)
 
-            channel = await inter.guild.create_text_channel(
-                "логирование",
-                category=category,
-                overwrites={
-                    **overwrites,
-                    inter.author: disnake.PermissionOverwrite(view_channel=True)
-                }
-            )
+        channel = await inter.guild.create_text_channel(
+            "логирование",
+            category=category,
+            overwrites={
+                **overwrites,
+                inter.author: disnake.PermissionOverwrite(view_channel=True)
+            }
+        )
 
+        await self.db.execute("""
+            INSERT OR REPLACE INTO settings (guild_id, is_setup, category_id, channel_id)
+            VALUES (?, 'True', ?, ?)
+        """, (inter.guild.id, category.id, channel.id))
+        self.log_channels[inter.guild.id] = channel.id
 
-            await db.execute("""
-                INSERT OR REPLACE INTO settings (guild_id, is_setup, category_id, channel_id)
-                VALUES (?, 'True', ?, ?)
-            """, (inter.guild.id, category.id, channel.id))
-            await db.commit()
+        await inter.edit_original_response(
+            content="**🛠️ Сетап логов**\n\n▰▰▰▰▰▰ [100%]\n\n✅ Сетап успешно завершен!"
+        )
 
-            await inter.edit_original_response(
-                content="**🛠️ Сетап логов**\n\n▰▰▰▰▰▰ [100%]\n\n✅ Сетап успешно завершен!"
-            )
+    @commands.slash_command(description="Заново отправить журнал модерации в канал логов")
+    @commands.has_permissions(administrator=True)
+    async def lreplay(self, inter: disnake.ApplicationCommandInteraction,
+                      since: str = commands.Param(description="С даты (ГГГГ-ММ-ДД)", default=None),
+                      until: str = commands.Param(description="По дату включительно (ГГГГ-ММ-ДД)", default=None)):
+        try:
+            for day in (since, until):
+                if day:
+                    datetime.datetime.strptime(day, "%Y-%m-%d")
+        except ValueError:
+            await inter.response.send_message("❌ Неверный формат даты. Используйте ГГГГ-ММ-ДД.", ephemeral=True)
+            return
+        
+        if not self.log_channels.get(inter.guild.id):
+            await inter.response.send_message("❌ Логирование не настроено.", ephemeral=True)
+            return
+        
+        await inter.response.defer(ephemeral=True)
+        sent = await self.replay_journal(inter.guild, since, until)
+        await inter.followup.send(f"✅ В канал логов поставлено записей журнала: **{sent}**", ephemeral=True)
 
     # ============= ЛОГИРОВАНИЕ СООБЩЕНИЙ =============
     @commands.Cog.listener()
     async def on_message_delete(self, message: disnake.Message):
         if message.author.bot or not message.guild:
             return
+        if message.id in self.ignored_deletes:
+            # Удалено массовой очисткой — она пишет одну общую запись
+            self.ignored_deletes.discard(message.id)
+            return
         
         deleted_message_text = message.content[:100] + "..." if len(message.content) > 100 else message.content
 
@@ -437,6 +529,14 @@ class Logs(commands.Cog):
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel):
+        # Удалён сам канал логов — сбрасываем настройку, чтобы lsetup можно было запустить снова
+        if self.log_channels.get(channel.guild.id) == channel.id:
+            del self.log_channels[channel.guild.id]
+            await self.db.execute(
+                "UPDATE settings SET is_setup = 'False', channel_id = NULL WHERE guild_id = ?",
+                (channel.guild.id,)
+            )
+
         await self.log_action(
             guild_id=channel.guild.id,
             user_id=None,
@@ -455,69 +555,109 @@ class Logs(commands.Cog):
         await self.send_log_embed(channel.guild, embed)
 
     # ============= МЕТОДЫ ДЛЯ ВНЕШНЕГО ВЫЗОВА ИЗ ДРУГИХ КОГОВ =============
-    async def log_moderation_action(self, guild_id: int, moderator_id: int, user_id: int, 
-                                    action: str, reason: str = None, duration: str = None):
-        """Логирование модерационных действий (вызывается из mod.py)"""
-        await self.log_action(
-            guild_id=guild_id,
-            user_id=moderator_id,  # Действие совершил модератор
-            action=action,
-            user_actioned_id=user_id,  # На кого было действие
-            moderator_id=moderator_id,
-            reason=reason,
-            duration=duration
+    def build_moderation_embed(self, moderator_id: int, user_id: int, action: str,
+                               reason: str = None, duration: str = None, timestamp: datetime.datetime = None):
+        """Эмбед записи журнала модерации"""
+        emoji = MODERATION_EMOJIS.get(action, "📝")
+        title = MODERATION_NAMES.get(action, action.upper())
+        
+        embed = disnake.Embed(
+            title=f"{emoji} {title}",
+            color=disnake.Color.orange(),
+            timestamp=timestamp or datetime.datetime.utcnow()
         )
+        embed.add_field(name="Модератор", value=f"<@{moderator_id}>", inline=True)
+        embed.add_field(name="Пользователь", value=f"<@{user_id}>", inline=True)
         
-        # Создаём embed для отправки в канал логов
-        action_emojis = {
-            "mute": "🔇",
-            "unmute": "🔊",
-            "kick": "👢",
-            "ban": "🚫",
-            "unban": "✅",
-            "warn": "⚠️",
-            "unwarn": "✅",
-            "clear": "🗑️"
-        }
+        if reason:
+            embed.add_field(name="Причина", value=reason, inline=False)
+        if duration:
+            embed.add_field(name="Длительность", value=duration, inline=False)
         
+        embed.set_footer(text=f"ID модератора: {moderator_id} | ID пользователя: {user_id}")
+        return embed
+
+    async def log_moderation_action(self, guild_id: int, moderator_id: int, user_id: int, 
+                                    action: str, reason: str = None, duration: str = None):
+        """Отправить действие модератора в канал логов (вызывается из mod.py)
+
+        Сама запись уже сделана в журнал punishments, в logs она не дублируется.
+        """
+        guild = self.bot.get_guild(guild_id)
+        if not guild:
+            return
+        
+        await self.send_log_embed(guild, self.build_moderation_embed(moderator_id, user_id, action, reason, duration))
+
+    async def log_bulk_moderation_action(self, guild_id: int, moderator_id: int, action: str,
+                                         user_ids: list, failed: int = 0, reason: str = None):
+        """Один эмбед на массовое действие модератора (вызывается из mod.py)"""
         action_names = {
-            "mute": "Мьют выдан",
-            "unmute": "Мьют снят",
-            "kick": "Кик",
-            "ban": "Бан",
-            "unban": "Разбан",
-            "warn": "Предупреждение",
-            "unwarn": "Снятие предупреждения",
-            "clear": "Очистка сообщений"
+            "massban": "🚫 Массовый бан",
+            "masskick": "👢 Массовый кик"
         }
         
-        emoji = action_emojis.get(action, "📝")
-        title = action_names.get(action, action.upper())
-        
         guild = self.bot.get_guild(guild_id)
         if not guild:
             return
         
-        moderator = guild.get_member(moderator_id)
-        user = guild.get_member(user_id) or await self.bot.fetch_user(user_id)
-        
         embed = disnake.Embed(
-            title=f"{emoji} {title}",
-            color=disnake.Color.orange(),
+            title=action_names.get(action, action.upper()),
+            color=disnake.Color.red(),
             timestamp=datetime.datetime.utcnow()
         )
-        embed.add_field(name="Модератор", value=moderator.mention if moderator else f"ID: {moderator_id}", inline=True)
-        embed.add_field(name="Пользователь", value=user.mention if user else f"ID: {user_id}", inline=True)
-        
+        embed.add_field(name="Модератор", value=f"<@{moderator_id}>", inline=True)
+        embed.add_field(name="Успешно / ошибок", value=f"{len(user_ids)} / {failed}", inline=True)
         if reason:
             embed.add_field(name="Причина", value=reason, inline=False)
-        if duration:
-            embed.add_field(name="Длительность", value=duration, inline=False)
+        if user_ids:
+            embed.add_field(name="Пользователи", value=", ".join(map(str, user_ids))[:1024], inline=False)
         
-        embed.set_footer(text=f"ID модератора: {moderator_id} | ID пользователя: {user_id}")
+        embed.set_footer(text=f"ID модератора: {moderator_id}")
         
         await self.send_log_embed(guild, embed)
 
+    async def replay_journal(self, guild, since: str = None, until: str = None) -> int:
+        """Заново отправить записи журнала модерации в канал логов, вернуть их число"""
+        channel_id = self.log_channels.get(guild.id)
+        channel = guild.get_channel(channel_id) if channel_id else None
+        if not channel:
+            return 0
+        
+        sql = "SELECT id, user_id, moderator_id, action_type, duration, reason, time FROM punishments WHERE guild_id = ?"
+        params = [guild.id]
+        if since:
+            sql += " AND time >= ?"
+            params.append(since)
+        if until:
+            sql += " AND time < date(?, '+1 day')"
+            params.append(until)
+        
+        sent = 0
+        cursor = None
+        while True:
+            # Журнал читается страницами по (time, id), чтобы не держать его целиком в памяти
+            page_sql = sql
+            page_params = list(params)
+            if cursor:
+                page_sql += " AND (time, id) > (?, ?)"
+                page_params += cursor
+            rows = await self.db.fetchall(f"{page_sql} ORDER BY time, id LIMIT ?", page_params + [self.REPLAY_PAGE_SIZE])
+            if not rows:
+                return sent
+            
+            for event_id, user_id, moderator_id, action, duration, reason, event_time in rows:
+                timestamp = datetime.datetime.fromisoformat(event_time).replace(tzinfo=datetime.timezone.utc)
+                self.dispatcher.put(channel, self.build_moderation_embed(
+                    moderator_id, user_id, action, reason, duration, timestamp
+                ))
+                sent += 1
+            cursor = [rows[-1][6], rows[-1][0]]
+            
+            # Не переполняем очередь отправки: иначе старые эмбеды будут вытеснены
+            while len(self.dispatcher.buffers.get(channel.id, ())) > self.dispatcher.max_pending - self.REPLAY_PAGE_SIZE:
+                await asyncio.sleep(1)
+
     async def log_ticket_action(self, guild_id: int, user_id: int, action: str, 
                                ticket_id: int = None, extra_info: str = None):
         """Логирование действий с тикетами (вызывается из tickets.py)"""
@@ -617,6 +757,158 @@ class Logs(commands.Cog):
         
         await self.send_log_embed(guild, embed)
 
-            
+
+class LogDispatcher:
+    """Отправка логов: эмбеды копятся по каналам и уходят до 10 штук за сообщение
+
+    Интервал между сообщениями подстраивается под лимиты Discord: растёт,
+    если отправка упёрлась в rate limit (429 или долгое ожидание бакета
+    внутри disnake), и постепенно возвращается к базовому.
+    """
+
+    MAX_EMBEDS = 10
+    MAX_CHARS = 6000
+
+    def __init__(self, base_interval: float = 1.0, max_interval: float = 30.0, max_pending: int = 500):
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.max_pending = max_pending
+
+        self.buffers = {}    # channel_id -> deque[(время постановки, embed)]
+        self.channels = {}   # channel_id -> канал
+        self.intervals = {}  # channel_id -> текущий интервал
+        self.tasks = {}      # channel_id -> задача отправки
+
+        self.messages = 0
+        self.embeds = 0
+        self.dropped = 0
+
+    def put(self, channel, embed):
+        buffer = self.buffers.setdefault(channel.id, deque())
+        if len(buffer) >= self.max_pending:
+            buffer.popleft()
+            self.dropped += 1
+        buffer.append((time.monotonic(), embed))
+        self.channels[channel.id] = channel
+
+        task = self.tasks.get(channel.id)
+        if task is None or task.done():
+            self.tasks[channel.id] = asyncio.get_running_loop().create_task(self._drain(channel))
+
+    def _take_batch(self, buffer):
+        batch = []
+        chars = 0
+        while buffer and len(batch) < self.MAX_EMBEDS:
+            size = len(buffer[0][1])
+            if batch and chars + size > self.MAX_CHARS:
+                break
+            batch.append(buffer.popleft())
+            chars += size
+        return batch
+
+    async def _send(self, channel, buffer):
+        """Отправить одну пачку, вернуть False если канал недоступен"""
+        batch = self._take_batch(buffer)
+        interval = self.intervals.get(channel.id, self.base_interval)
+        started = time.monotonic()
+
+        try:
+            await channel.send(embeds=[embed for _, embed in batch])
+        except asyncio.CancelledError:
+            # Остановка посреди отправки: пачка возвращается в очередь и уйдёт при close()
+            buffer.extendleft(reversed(batch))
+            raise
+        except (disnake.NotFound, disnake.Forbidden):
+            self.dropped += len(batch) + len(buffer)
+            buffer.clear()
+            return False
+        except disnake.HTTPException as e:
+            if e.status == 429:
+                # Возвращаем пачку в начало очереди и ждём сброса лимита
+                buffer.extendleft(reversed(batch))
+                headers = e.response.headers
+                retry_after = float(headers.get("Retry-After") or headers.get("X-RateLimit-Reset-After") or interval * 2)
+                self.intervals[channel.id] = min(self.max_interval, max(interval, retry_after))
+            else:
+                self.dropped += len(batch)
+                print(f"❌ Ошибка отправки логов в {channel.id}: {e}")
+            return True
+
+        self.messages += 1
+        self.embeds += len(batch)
+
+        elapsed = time.monotonic() - started
+        if elapsed > interval:
+            # disnake ждал освобождения бакета — отправляем реже
+            self.intervals[channel.id] = min(self.max_interval, elapsed)
+        else:
+            self.intervals[channel.id] = max(self.base_interval, interval * 0.75)
+        return True
+
+    async def _drain(self, channel):
+        buffer = self.buffers[channel.id]
+        try:
+            while buffer:
+                # Короткое окно, чтобы собрать соседние события в одно сообщение
+                await asyncio.sleep(self.intervals.get(channel.id, self.base_interval))
+                if not await self._send(channel, buffer):
+                    break
+        finally:
+            self.tasks.pop(channel.id, None)
+            if not buffer:
+                self.buffers.pop(channel.id, None)
+                self.channels.pop(channel.id, None)
+                self.intervals.pop(channel.id, None)
+
+    def stats(self):
+        now = time.monotonic()
+        depth = sum(len(buffer) for buffer in self.buffers.values())
+        lag = max((now - buffer[0][0] for buffer in self.buffers.values() if buffer), default=0.0)
+        interval = max(self.intervals.values(), default=self.base_interval)
+        return {
+            'depth': depth,
+            'lag': lag,
+            'interval': interval,
+            'messages': self.messages,
+            'embeds': self.embeds,
+            'dropped': self.dropped,
+        }
+
+    async def close(self, timeout: float = 10.0):
+        """Остановить фоновые задачи и отправить остаток, но не дольше timeout секунд
+
+        Что не успело уйти (например, канал упёрся в rate limit), отбрасывается
+        и учитывается в dropped.
+        """
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        # Дожидаемся отмены, чтобы прерванные пачки успели вернуться в очередь
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks.clear()
+
+        try:
+            await asyncio.wait_for(self._flush_remaining(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        left = sum(len(buffer) for buffer in self.buffers.values())
+        if left:
+            self.dropped += left
+            print(f"⚠️ При остановке не отправлено эмбедов логов: {left}")
+        self.buffers.clear()
+
+    async def _flush_remaining(self):
+        for channel_id, buffer in list(self.buffers.items()):
+            channel = self.channels.get(channel_id)
+            while buffer and channel:
+                sent = self.messages
+                if not await self._send(channel, buffer):
+                    break
+                if self.messages == sent:
+                    # Пачка не ушла (429 вернул её в очередь) — ждём сброса лимита
+                    await asyncio.sleep(self.intervals.get(channel_id, self.base_interval))
+
+
 def setup(bot):
     bot.add_cog(Logs(bot))
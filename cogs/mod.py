@@ -1,20 +1,90 @@
 import disnake
 from disnake.ext import commands
-import aiosqlite
 import datetime
 from datetime import timedelta
 import asyncio
+import re
+import time
+
+from utils.notifier import DMDispatcher
+from utils.scheduler import DeadlineScheduler
+
+# Единицы длительности: 30м, 2ч, 1д, 1н
+TIME_MULTIPLIERS = {
+    'с': 1,
+    'м': 60,
+    'ч': 3600,
+    'д': 86400,
+    'н': 604800
+}
+
+
+def parse_duration(text: str) -> int:
+    """Длительность вида «30м», «2ч», «1д» в секундах (ValueError при неверном формате)"""
+    text = text.strip().lower()
+    if len(text) < 2 or text[-1] not in TIME_MULTIPLIERS:
+        raise ValueError(f"Неверная длительность: {text}")
+    
+    value = int(text[:-1])
+    if value <= 0:
+        raise ValueError(f"Неверная длительность: {text}")
+    return value * TIME_MULTIPLIERS[text[-1]]
+
+
+# Значки типов наказаний в истории
+ACTION_EMOJI = {
+    "mute": "🔇", "unmute": "🔊", "kick": "👢", 
+    "ban": "🚫", "unban": "✅", "warn": "⚠️", 
+    "unwarn": "✅", "clear": "🗑️"
+}
+
+
+# Журнал модерации: единственная запись о каждом действии, канал логов строится по нему
+JOURNAL_INSERT = """INSERT INTO punishments (guild_id, user_id, moderator_id, action_type, duration, reason) 
+    VALUES (?, ?, ?, ?, ?, ?)"""
+
 
 class Moderation(commands.Cog):
+    # Массовые действия: одновременных запросов, максимум целей и размер пачки bulk_ban
+    BULK_CONCURRENCY = 5
+    BULK_MAX_TARGETS = 1000
+    BULK_BAN_CHUNK = 200
+    # Очистка: максимум удаляемых, сколько сообщений просматривается и пауза между одиночными удалениями
+    CLEAR_MAX = 10000
+    CLEAR_SCAN_LIMIT = 20000
+    CLEAR_SINGLE_DELAY = 1.0
+    # Отложенные действия: одновременно выполняемых и пауза перед повтором после ошибки API, с
+    SCHEDULED_CONCURRENCY = 5
+    SCHEDULED_RETRY_DELAY = 300
+    # Максимальный срок тайм-аута в Discord (28 дней), с
+    MUTE_MAX_SECONDS = 2419200
+    # История: записей на странице и префикс custom_id кнопок листания
+    HISTORY_PAGE_SIZE = 10
+    HISTORY_PREFIX = "modhist:"
+    # Сколько кик и бан ждут доставки ЛС перед наказанием, с
+    DM_BUDGET = 1.5
+    
     def __init__(self, bot):
         self.bot = bot
-        self.path = "dbs/file.db"
-
-    async def init_db(self):
-        async with aiosqlite.connect(self.path) as db:
+        self.db = bot.db
+        # Сроки временных банов и предупреждений; scheduled_actions — постоянное хранилище.
+        # Наступившие действия выполняют SCHEDULED_CONCURRENCY обработчиков планировщика
+        self.scheduler = DeadlineScheduler(
+            self.run_scheduled_action, name="наказания", concurrency=self.SCHEDULED_CONCURRENCY
+        )
+        # (guild_id, user_id) -> число активных предупреждений, зеркало warning_counts
+        self.warning_counts = {}
+        # guild_id -> {число предупреждений: (действие, длительность)}
+        self.escalations = {}
+        # Уведомления наказанным отправляются в фоне и не задерживают команды
+        self.dms = DMDispatcher(name="модерации")
+        bot.router.register_prefix(self.HISTORY_PREFIX, self.handle_history_page)
 
-            await db.execute("PRAGMA journal_mode=WAL")
+    def cog_unload(self):
+        self.bot.router.unregister_owner(self)
 
+    async def init_db(self):
+        async with self.db.write() as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS warnings (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -22,7 +92,20 @@ class Moderation(commands.Cog):
                     moderator_id INTEGER NOT NULL,
                     reason TEXT,
                     time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    active TEXT DEFAULT "true"
+                    active TEXT DEFAULT "true",
+                    guild_id INTEGER DEFAULT NULL
+                )""")
+            
+            async with db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'warning_counts'") as cursor:
+                counts_exist = await cursor.fetchone() is not None
+            
+            # Число активных предупреждений, поддерживается вместе с warnings
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS warning_counts (
+                    guild_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    active_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, user_id)
                 )""")
             
             await db.execute("""
@@ -36,49 +119,278 @@ class Moderation(commands.Cog):
                     time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     guild_id INTEGER NOT NULL
                 )""")
-            await db.commit()
+            
+            # Отложенные действия: снятие временных банов и предупреждений
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS scheduled_actions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    guild_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    action TEXT NOT NULL,
+                    target_id INTEGER DEFAULT NULL,
+                    due_at REAL NOT NULL
+                )""")
+            
+            # Правила эскалации: при N активных предупреждениях — мьют или бан
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS warn_escalations (
+                    guild_id INTEGER NOT NULL,
+                    threshold INTEGER NOT NULL,
+                    action TEXT NOT NULL,
+                    duration TEXT,
+                    PRIMARY KEY (guild_id, threshold)
+                )""")
+        
+        await self.db.add_column("warnings", "guild_id", "INTEGER DEFAULT NULL")
+        
+        async with self.db.write() as db:
+            # Старые предупреждения без сервера: берём сервер из парной записи в punishments
+            await db.execute("""
+                UPDATE warnings SET guild_id = (
+                    SELECT guild_id FROM (
+                        SELECT p.guild_id, abs(julianday(p.time) - julianday(warnings.time)) AS distance
+                        FROM punishments p
+                        WHERE p.action_type = 'warn' AND p.user_id = warnings.user_id
+                        AND p.moderator_id = warnings.moderator_id AND p.reason IS warnings.reason
+                    ) ORDER BY distance LIMIT 1
+                ) WHERE guild_id IS NULL""")
+            
+            if not counts_exist:
+                await db.execute("""
+                    INSERT OR REPLACE INTO warning_counts (guild_id, user_id, active_count)
+                    SELECT guild_id, user_id, COUNT(*) FROM warnings
+                    WHERE active = 'true' AND guild_id IS NOT NULL GROUP BY guild_id, user_id""")
+        self.warning_counts = {}
+        await self.load_escalations()
+        
+        # Просроченное за время простоя выполнится сразу после запуска
+        rows = await self.db.fetchall("SELECT id, due_at FROM scheduled_actions")
+        self.scheduler.clear()
+        for action_id, due_at in rows:
+            self.scheduler.schedule(action_id, due_at)
+        self.scheduler.start()
+
+    async def shutdown(self):
+        await self.scheduler.close()
+        await self.dms.close()
+
+    def stats(self):
+        stats = {"Отложенных действий": len(self.scheduler) + self.scheduler.backlog}
+        next_due = self.scheduler.next_due
+        if next_due:
+            stats["Ближайшее"] = f"<t:{int(next_due)}:R>"
+        for name, value in self.dms.stats().items():
+            stats[f"ЛС: {name.lower()}"] = value
+        return stats
+
+    async def schedule_action(self, guild_id: int, user_id: int, action: str, seconds: int, target_id: int = None):
+        """Запланировать действие (unban / unwarn) через seconds секунд"""
+        due_at = time.time() + seconds
+        action_id = await self.db.execute(
+            "INSERT INTO scheduled_actions (guild_id, user_id, action, target_id, due_at) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, user_id, action, target_id, due_at)
+        )
+        self.scheduler.schedule(action_id, due_at)
+        return due_at
 
-    async def warn_user(self, user_id: int, moderator_id: int, reason: str = None):
-        async with aiosqlite.connect(self.path) as db:
+    async def cancel_actions(self, guild_id: int, user_id: int, action: str):
+        rows = await self.db.fetchall(
+            "SELECT id FROM scheduled_actions WHERE guild_id = ? AND user_id = ? AND action = ?",
+            (guild_id, user_id, action)
+        )
+        for (action_id,) in rows:
+            self.scheduler.cancel(action_id)
+        if rows:
+            await self.db.executemany("DELETE FROM scheduled_actions WHERE id = ?", rows)
+
+    async def run_scheduled_action(self, action_id):
+        """Выполнить наступившее действие; при ошибке API повторить позже"""
+        row = await self.db.fetchone(
+            "SELECT guild_id, user_id, action, target_id FROM scheduled_actions WHERE id = ?", (action_id,)
+        )
+        if not row:
+            return
+        guild_id, user_id, action, target_id = row
+        
+        try:
+            if action == "unban":
+                await self.expire_ban(guild_id, user_id)
+            elif action == "unwarn":
+                reason = "Срок предупреждения истёк"
+                if await self.unwarn_user(guild_id, user_id, True, target_id, self.bot.user.id, reason):
+                    await self.announce(guild_id, user_id, self.bot.user.id, "unwarn", None, reason)
+        except disnake.HTTPException as e:
+            due_at = time.time() + self.SCHEDULED_RETRY_DELAY
+            await self.db.execute("UPDATE scheduled_actions SET due_at = ? WHERE id = ?", (due_at, action_id))
+            self.scheduler.schedule(action_id, due_at)
+            print(f"⚠️ Отложенное действие {action} ({user_id}) не выполнено: {e}")
+            return
+        
+        await self.db.execute("DELETE FROM scheduled_actions WHERE id = ?", (action_id,))
+
+    async def expire_ban(self, guild_id: int, user_id: int):
+        """Снять временный бан по истечении срока"""
+        guild = self.bot.get_guild(guild_id)
+        if not guild:
+            return
+        
+        try:
+            await guild.unban(disnake.Object(user_id), reason="Срок бана истёк")
+        except disnake.NotFound:
+            return
+        except disnake.Forbidden:
+            # Права банить у бота нет — повтор не поможет, запись удаляется
+            print(f"⚠️ Нет прав снять временный бан {user_id} на сервере {guild_id}")
+            return
+
+        await self.log_punishment(guild_id, user_id, self.bot.user.id, "unban", None, "Срок бана истёк")
+
+    async def load_escalations(self, guild_id: int = None):
+        """Собрать правила эскалации в словарь (всех серверов или одного)"""
+        if guild_id is None:
+            rows = await self.db.fetchall("SELECT guild_id, threshold, action, duration FROM warn_escalations")
+            self.escalations = {}
+        else:
+            rows = await self.db.fetchall(
+                "SELECT guild_id, threshold, action, duration FROM warn_escalations WHERE guild_id = ?", (guild_id,)
+            )
+            self.escalations.pop(guild_id, None)
+        
+        for rule_guild_id, threshold, action, duration in rows:
+            self.escalations.setdefault(rule_guild_id, {})[threshold] = (action, duration)
+
+    async def escalate(self, guild, member, moderator, count: int):
+        """Применить правило для достигнутого числа предупреждений; вернуть (действие, длительность) или None"""
+        rule = self.escalations.get(guild.id, {}).get(count)
+        if rule is None:
+            return None
+        
+        action, duration = rule
+        reason = f"Эскалация: {count} активных предупреждений"
+        if action == "mute":
+            await self.apply_mute(guild, member, moderator, duration, reason)
+        else:
+            await self.apply_ban(guild, member, moderator, reason, duration)
+        return rule
+
+    async def apply_mute(self, guild, member, moderator, duration: str, reason: str):
+        """Выдать мьют и записать его в журнал (общий путь /mute и эскалаций)"""
+        seconds = parse_duration(duration)
+        await member.timeout(duration=timedelta(seconds=seconds), reason=f"{reason} | Модератор: {moderator}")
+        
+        await self.log_punishment(guild.id, member.id, moderator.id, "mute", duration, reason)
+        return seconds
+
+    async def apply_ban(self, guild, user, moderator, reason: str, duration: str = None, delete_messages: int = 0):
+        """Забанить (временно, если задан срок) и записать в журнал (общий путь /ban и эскалаций)"""
+        seconds = parse_duration(duration) if duration else None
+        await guild.ban(
+            user, 
+            reason=f"{reason} | Модератор: {moderator}",
+            delete_message_days=delete_messages
+        )
+        
+        # Новый бан заменяет прежний срок
+        await self.cancel_actions(guild.id, user.id, "unban")
+        if seconds:
+            await self.schedule_action(guild.id, user.id, "unban", seconds)
+        
+        await self.log_punishment(guild.id, user.id, moderator.id, "ban", duration, reason)
+        return seconds
+
+    async def warn_user(self, guild_id: int, user_id: int, moderator_id: int, reason: str = None, duration: str = None):
+        """Выдать предупреждение, увеличить счётчик и записать в журнал одной транзакцией, вернуть (id, активных)"""
+        async with self.db.write() as db:
             cursor = await db.execute(
-                "INSERT INTO warnings (user_id, moderator_id, reason) VALUES (?, ?, ?)", 
-                (user_id, moderator_id, reason)
+                "INSERT INTO warnings (guild_id, user_id, moderator_id, reason) VALUES (?, ?, ?, ?)", 
+                (guild_id, user_id, moderator_id, reason)
             )
-            await db.commit()
-            return cursor.lastrowid
+            warn_id = cursor.lastrowid
+            await cursor.close()
+            
+            await db.execute(JOURNAL_INSERT, (guild_id, user_id, moderator_id, "warn", duration, reason))
+            
+            await db.execute(
+                """INSERT INTO warning_counts (guild_id, user_id, active_count) VALUES (?, ?, 1)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET active_count = active_count + 1""",
+                (guild_id, user_id)
+            )
+            async with db.execute(
+                "SELECT active_count FROM warning_counts WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+            ) as cursor:
+                count = (await cursor.fetchone())[0]
+        
+        self.warning_counts[(guild_id, user_id)] = count
+        return warn_id, count
 
     async def log_punishment(self, guild_id: int, user_id: int, moderator_id: int, action_type: str, duration: str = None, reason: str = None):
-        """Логировать наказание в базу данных"""
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute(
-                """INSERT INTO punishments (guild_id, user_id, moderator_id, action_type, duration, reason) 
-                VALUES (?, ?, ?, ?, ?, ?)""",
-                (guild_id, user_id, moderator_id, action_type, duration, reason)
+        """Записать действие в журнал модерации и отправить его в канал логов"""
+        await self.db.execute(JOURNAL_INSERT, (guild_id, user_id, moderator_id, action_type, duration, reason))
+        await self.announce(guild_id, user_id, moderator_id, action_type, duration, reason)
+
+    async def log_punishments(self, rows):
+        """Записать пачку действий в журнал одной транзакцией"""
+        await self.db.executemany(JOURNAL_INSERT, rows)
+
+    async def announce(self, guild_id: int, user_id: int, moderator_id: int, action_type: str, duration: str = None, reason: str = None):
+        """Отправить уже записанное в журнал действие в канал логов"""
+        logs_cog = self.bot.get_cog('Logs')
+        if logs_cog:
+            await logs_cog.log_moderation_action(
+                guild_id=guild_id,
+                moderator_id=moderator_id,
+                user_id=user_id,
+                action=action_type,
+                reason=reason,
+                duration=duration
             )
-            await db.commit()
-
-    async def unwarn_user(self, user_id: int, by_moderator: bool = False, warn_id: int = None):
-        async with aiosqlite.connect(self.path) as db:
-            if by_moderator:
-                if warn_id:
-                    await db.execute("UPDATE warnings SET active = 'false' WHERE id = ? AND user_id = ?", 
-                                    (warn_id, user_id))
-                else:
-                    await db.execute("UPDATE warnings SET active = 'false' WHERE user_id = ? AND active = 'true' ORDER BY id DESC LIMIT 1", 
-                                    (user_id,))
-                await db.commit()
-                return True
+
+    async def unwarn_user(self, guild_id: int, user_id: int, by_moderator: bool = False, warn_id: int = None,
+                          moderator_id: int = None, reason: str = None):
+        """Снять активное предупреждение (указанное или последнее); False, если снимать нечего
+
+        Если передан moderator_id, снятие записывается в журнал в той же транзакции.
+        """
+        if not by_moderator:
             return False
+        
+        async with self.db.write() as db:
+            if warn_id:
+                cursor = await db.execute(
+                    "UPDATE warnings SET active = 'false' WHERE id = ? AND guild_id = ? AND user_id = ? AND active = 'true'", 
+                    (warn_id, guild_id, user_id)
+                )
+            else:
+                cursor = await db.execute(
+                    """UPDATE warnings SET active = 'false' WHERE id = (
+                        SELECT id FROM warnings WHERE guild_id = ? AND user_id = ? AND active = 'true'
+                        ORDER BY time DESC, id DESC LIMIT 1)""", 
+                    (guild_id, user_id)
+                )
+            changed = cursor.rowcount
+            await cursor.close()
+            
+            if changed:
+                await db.execute(
+                    "UPDATE warning_counts SET active_count = max(active_count - 1, 0) WHERE guild_id = ? AND user_id = ?",
+                    (guild_id, user_id)
+                )
+                if moderator_id:
+                    await db.execute(JOURNAL_INSERT, (guild_id, user_id, moderator_id, "unwarn", None, reason))
+        
+        if changed:
+            self.warning_counts.pop((guild_id, user_id), None)
+        return bool(changed)
 
-    async def get_warnings_count(self, user_id: int):
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute(
-                "SELECT COUNT(*) FROM warnings WHERE user_id = ? AND active = 'true'", 
-                (user_id,)
+    async def get_warnings_count(self, guild_id: int, user_id: int):
+        key = (guild_id, user_id)
+        if key not in self.warning_counts:
+            count = await self.db.fetchone(
+                "SELECT active_count FROM warning_counts WHERE guild_id = ? AND user_id = ?", 
+                key
             )
-            count = await cursor.fetchone()
-            await cursor.close()
-            return count[0] if count else 0
+            self.warning_counts[key] = count[0] if count else 0
+        return self.warning_counts[key]
 
     @commands.slash_command(name="mute", description="Выдать мьют пользователю на сервере.")
     @commands.has_permissions(mute_members=True)
@@ -92,47 +404,14 @@ class Moderation(commands.Cog):
             await inter.response.send_message("❌ Вы не можете замутить этого пользователя.", ephemeral=True)
             return
         
-        # Парсинг времени
-        time_multipliers = {
-            'с': 1,
-            'м': 60,
-            'ч': 3600,
-            'д': 86400,
-            'н': 604800
-        }
-        
         try:
-            time_value = int(duration[:-1])
-            time_unit = duration[-1].lower()
-            
-            if time_unit not in time_multipliers:
-                raise ValueError
-            
-            seconds = time_value * time_multipliers[time_unit]
+            seconds = parse_duration(duration)
             
-            if seconds > 2419200:  # 28 дней
+            if seconds > self.MUTE_MAX_SECONDS:
                 await inter.response.send_message("❌ Максимальное время мьюта - 28 суток.", ephemeral=True)
                 return
             
-            # Выдача мьюта
-            await user.timeout(duration=timedelta(seconds=seconds), reason=f"{reason} | Модератор: {inter.author}")
-            
-            # Логируем в базу данных
-            await self.log_punishment(
-                inter.guild.id, user.id, inter.author.id, "mute", duration, reason
-            )
-            
-            # Логируем через систему логов
-            logs_cog = self.bot.get_cog('Logs')
-            if logs_cog:
-                await logs_cog.log_moderation_action(
-                    guild_id=inter.guild.id,
-                    moderator_id=inter.author.id,
-                    user_id=user.id,
-                    action="mute",
-                    reason=reason,
-                    duration=duration
-                )
+            await self.apply_mute(inter.guild, user, inter.author, duration, reason)
             
             embed = disnake.Embed(
                 title="🔇 Мьют выдан",
@@ -143,11 +422,7 @@ class Moderation(commands.Cog):
             
             await inter.response.send_message(embed=embed)
             
-            # Отправляем сообщение пользователю
-            try:
-                await user.send(f"🔇 Вы получили мьют на сервере **{inter.guild.name}** на **{duration}**.\n**Причина:** {reason}\n**Модератор:** {inter.author}")
-            except:
-                pass
+            self.dms.send(user, f"🔇 Вы получили мьют на сервере **{inter.guild.name}** на **{duration}**.\n**Причина:** {reason}\n**Модератор:** {inter.author}")
                 
         except ValueError:
             await inter.response.send_message("❌ Неверный формат времени. Используйте: 1ч, 30м, 2д и т.д.", ephemeral=True)
@@ -163,22 +438,11 @@ class Moderation(commands.Cog):
         try:
             await user.timeout(duration=None, reason=f"{reason} | Модератор: {inter.author}")
             
-            # Логируем в базу данных
+            # Журнал модерации и канал логов
             await self.log_punishment(
                 inter.guild.id, user.id, inter.author.id, "unmute", None, reason
             )
             
-            # Логируем через систему логов
-            logs_cog = self.bot.get_cog('Logs')
-            if logs_cog:
-                await logs_cog.log_moderation_action(
-                    guild_id=inter.guild.id,
-                    moderator_id=inter.author.id,
-                    user_id=user.id,
-                    action="unmute",
-                    reason=reason
-                )
-            
             embed = disnake.Embed(
                 title="🔊 Мьют снят",
                 description=f"**Пользователь:** {user.mention}\n**Причина:** {reason}",
@@ -188,10 +452,7 @@ class Moderation(commands.Cog):
             
             await inter.response.send_message(embed=embed)
             
-            try:
-                await user.send(f"🔊 Ваш мьют был снят на сервере **{inter.guild.name}**.\n**Причина:** {reason}\n**Модератор:** {inter.author}")
-            except:
-                pass
+            self.dms.send(user, f"🔊 Ваш мьют был снят на сервере **{inter.guild.name}**.\n**Причина:** {reason}\n**Модератор:** {inter.author}")
                 
         except Exception as e:
             await inter.response.send_message(f"❌ Ошибка: {str(e)}", ephemeral=True)
@@ -207,30 +468,19 @@ class Moderation(commands.Cog):
             return
         
         try:
-            # Отправляем сообщение пользователю перед киком
-            try:
-                await user.send(f"👢 Вы были кикнуты с сервера **{inter.guild.name}**.\n**Причина:** {reason}\n**Модератор:** {inter.author}")
-            except:
-                pass
+            # После кика ЛС может не дойти, поэтому ждём его, но не дольше DM_BUDGET
+            await self.dms.send_within(
+                self.DM_BUDGET, user,
+                f"👢 Вы были кикнуты с сервера **{inter.guild.name}**.\n**Причина:** {reason}\n**Модератор:** {inter.author}"
+            )
             
             await user.kick(reason=f"{reason} | Модератор: {inter.author}")
             
-            # Логируем в базу данных
+            # Журнал модерации и канал логов
             await self.log_punishment(
                 inter.guild.id, user.id, inter.author.id, "kick", None, reason
             )
             
-            # Логируем через систему логов
-            logs_cog = self.bot.get_cog('Logs')
-            if logs_cog:
-                await logs_cog.log_moderation_action(
-                    guild_id=inter.guild.id,
-                    moderator_id=inter.author.id,
-                    user_id=user.id,
-                    action="kick",
-                    reason=reason
-                )
-            
             embed = disnake.Embed(
                 title="👢 Кик выдан",
                 description=f"**Пользователь:** {user.mention}\n**Причина:** {reason}",
@@ -253,7 +503,8 @@ class Moderation(commands.Cog):
                       default=0,
                       min_value=0,
                       max_value=7
-                  )):
+                  ),
+                  duration: str = commands.Param(description="Срок бана (пример: 12ч, 7д). Пусто — навсегда", default=None)):
         
         # Если user - это Member, проверяем роли
         if isinstance(user, disnake.Member):
@@ -262,39 +513,28 @@ class Moderation(commands.Cog):
                 return
         
         try:
-            # Отправляем сообщение пользователю перед баном
-            try:
-                await user.send(f"🚫 Вы были забанены на сервере **{inter.guild.name}**.\n**Причина:** {reason}\n**Модератор:** {inter.author}")
-            except:
-                pass
-            
-            await inter.guild.ban(
-                user, 
-                reason=f"{reason} | Модератор: {inter.author}",
-                delete_message_days=delete_messages
-            )
-            
-            # Логируем в базу данных
-            await self.log_punishment(
-                inter.guild.id, user.id, inter.author.id, "ban", None, reason
+            seconds = parse_duration(duration) if duration else None
+        except ValueError:
+            await inter.response.send_message("❌ Неверный формат времени. Используйте: 1ч, 30м, 2д и т.д.", ephemeral=True)
+            return
+        
+        try:
+            # После бана ЛС может не дойти, поэтому ждём его, но не дольше DM_BUDGET
+            term = f" на **{duration}**" if duration else ""
+            await self.dms.send_within(
+                self.DM_BUDGET, user,
+                f"🚫 Вы были забанены на сервере **{inter.guild.name}**{term}.\n**Причина:** {reason}\n**Модератор:** {inter.author}"
             )
             
-            # Логируем через систему логов
-            logs_cog = self.bot.get_cog('Logs')
-            if logs_cog:
-                await logs_cog.log_moderation_action(
-                    guild_id=inter.guild.id,
-                    moderator_id=inter.author.id,
-                    user_id=user.id,
-                    action="ban",
-                    reason=reason
-                )
+            await self.apply_ban(inter.guild, user, inter.author, reason, duration, delete_messages)
             
             embed = disnake.Embed(
                 title="🚫 Бан выдан",
                 description=f"**Пользователь:** {user.mention}\n**Причина:** {reason}",
                 color=disnake.Color.red()
             )
+            if seconds:
+                embed.add_field(name="Срок", value=f"{duration} (до <t:{int(time.time() + seconds)}:f>)")
             if delete_messages > 0:
                 embed.add_field(name="Удалено сообщений", value=f"За последние {delete_messages} дней")
             embed.set_footer(text=f"Модератор: {inter.author}")
@@ -314,22 +554,13 @@ class Moderation(commands.Cog):
             user = await self.bot.fetch_user(user_id)
             
             await inter.guild.unban(user, reason=f"Разбанен модератором {inter.author}")
+            await self.cancel_actions(inter.guild.id, user.id, "unban")
             
-            # Логируем в базу данных
+            # Журнал модерации и канал логов
             await self.log_punishment(
                 inter.guild.id, user.id, inter.author.id, "unban", None, "Разбанен"
             )
             
-            # Логируем через систему логов
-            logs_cog = self.bot.get_cog('Logs')
-            if logs_cog:
-                await logs_cog.log_moderation_action(
-                    guild_id=inter.guild.id,
-                    moderator_id=inter.author.id,
-                    user_id=user.id,
-                    action="unban"
-                )
-            
             embed = disnake.Embed(
                 title="✅ Разбан",
                 description=f"**Пользователь:** {user.mention} разбанен",
@@ -346,90 +577,486 @@ class Moderation(commands.Cog):
         except Exception as e:
             await inter.response.send_message(f"❌ Ошибка: {str(e)}", ephemeral=True)
 
+    # ============= МАССОВЫЕ ДЕЙСТВИЯ =============
+    def collect_targets(self, inter, ids: str = None, joined_within: str = None,
+                        account_younger: str = None, members_only: bool = False):
+        """Цели массового действия: явные ID плюс участники, подходящие под все фильтры
+        
+        Возвращает (цели, пропущено). Участники не выше модератора и бота, сам
+        модератор, бот и владелец сервера пропускаются.
+        """
+        guild = inter.guild
+        targets = {}
+        
+        for user_id in re.findall(r"\d{17,20}", ids or ""):
+            user_id = int(user_id)
+            member = guild.get_member(user_id)
+            if member or not members_only:
+                targets[user_id] = member or disnake.Object(user_id)
+        
+        if joined_within or account_younger:
+            now = disnake.utils.utcnow()
+            joined_after = now - timedelta(seconds=parse_duration(joined_within)) if joined_within else None
+            created_after = now - timedelta(seconds=parse_duration(account_younger)) if account_younger else None
+            for member in guild.members:
+                if joined_after and (not member.joined_at or member.joined_at < joined_after):
+                    continue
+                if created_after and member.created_at < created_after:
+                    continue
+                targets[member.id] = member
+        
+        allowed = []
+        skipped = 0
+        for user_id, target in targets.items():
+            if user_id in (inter.author.id, guild.me.id, guild.owner_id):
+                skipped += 1
+            elif isinstance(target, disnake.Member) and (
+                    target.top_role >= inter.author.top_role or target.top_role >= guild.me.top_role):
+                skipped += 1
+            else:
+                allowed.append(target)
+        return allowed, skipped
+
+    async def run_bulk(self, inter, title, units, action):
+        """Выполнить action над пачками целей с ограниченной параллельностью
+        
+        action(пачка) возвращает ID успешно обработанных. При 429 пачка
+        повторяется после Retry-After. Прогресс раз в пару секунд
+        выводится в исходный ответ, пока жив токен. Возвращает (успешные ID, неудачные ID).
+        """
+        total = sum(len(unit) for unit in units)
+        semaphore = asyncio.Semaphore(self.BULK_CONCURRENCY)
+        succeeded = []
+        failed = []
+        
+        async def run(unit):
+            async with semaphore:
+                for attempt in range(3):
+                    try:
+                        done = set(await action(unit))
+                        break
+                    except disnake.HTTPException as e:
+                        if e.status == 429 and attempt < 2:
+                            await asyncio.sleep(float(e.response.headers.get('Retry-After', 1)))
+                            continue
+                        done = set()
+                        break
+                    except Exception:
+                        done = set()
+                        break
+                succeeded.extend(target.id for target in unit if target.id in done)
+                failed.extend(target.id for target in unit if target.id not in done)
+        
+        async def report():
+            while self.interaction_alive(inter):
+                processed = len(succeeded) + len(failed)
+                try:
+                    await inter.edit_original_response(content=f"⏳ {title}: {processed}/{total}")
+                except disnake.HTTPException:
+                    pass
+                await asyncio.sleep(2)
+        
+        reporter = asyncio.get_running_loop().create_task(report())
+        try:
+            await asyncio.gather(*(run(unit) for unit in units))
+        finally:
+            reporter.cancel()
+        return succeeded, failed
+
+    async def finish_bulk(self, inter, action, title, succeeded, failed, skipped, reason):
+        """Одна транзакция в журнале, один эмбед в логах и итоговый эмбед"""
+        if succeeded:
+            await self.log_punishments([
+                (inter.guild.id, user_id, inter.author.id, action, None, reason) for user_id in succeeded
+            ])
+        
+        logs_cog = self.bot.get_cog('Logs')
+        if logs_cog and (succeeded or failed):
+            await logs_cog.log_bulk_moderation_action(
+                guild_id=inter.guild.id,
+                moderator_id=inter.author.id,
+                action=action,
+                user_ids=succeeded,
+                failed=len(failed),
+                reason=reason
+            )
+        
+        embed = disnake.Embed(
+            title=title,
+            description=f"**Успешно:** {len(succeeded)}\n**Ошибок:** {len(failed)}\n"
+                        f"**Пропущено:** {skipped}\n**Причина:** {reason}",
+            color=disnake.Color.red() if succeeded else disnake.Color.orange()
+        )
+        if failed:
+            embed.add_field(name="Не удалось", value=", ".join(map(str, failed))[:1024], inline=False)
+        embed.set_footer(text=f"Модератор: {inter.author}")
+        
+        if self.interaction_alive(inter):
+            await inter.edit_original_response(content=None, embed=embed)
+        else:
+            # Долгая операция пережила токен ответа — итог пишем в сам канал
+            await inter.channel.send(content=inter.author.mention, embed=embed)
+
+    @commands.slash_command(name="massban", description="Забанить сразу многих пользователей (рейд).")
+    @commands.has_permissions(ban_members=True)
+    async def massban(self, inter: disnake.ApplicationCommandInteraction,
+                      ids: str = commands.Param(description="ID или упоминания через пробел", default=None),
+                      joined_within: str = commands.Param(description="Зашли на сервер за последние (пример: 10м, 1ч)", default=None),
+                      account_younger: str = commands.Param(description="Аккаунт моложе (пример: 1д, 1н)", default=None),
+                      reason: str = commands.Param(description="Причина", default="Рейд"),
+                      delete_messages: int = commands.Param(
+                          description="Удалить сообщения за последние дни (0-7)",
+                          default=0,
+                          min_value=0,
+                          max_value=7
+                      )):
+        try:
+            targets, skipped = self.collect_targets(inter, ids, joined_within, account_younger)
+        except ValueError:
+            await inter.response.send_message("❌ Неверный формат времени. Используйте: 1ч, 30м, 2д и т.д.", ephemeral=True)
+            return
+        
+        if not targets:
+            await inter.response.send_message("❌ Нет подходящих пользователей.", ephemeral=True)
+            return
+        if len(targets) > self.BULK_MAX_TARGETS:
+            await inter.response.send_message(f"❌ Слишком много целей: {len(targets)}. Максимум: {self.BULK_MAX_TARGETS}.", ephemeral=True)
+            return
+        
+        await inter.response.send_message(f"⏳ Массовый бан: 0/{len(targets)}")
+        audit_reason = f"{reason} | Массовый бан | Модератор: {inter.author}"
+        
+        # bulk_ban банит до 200 человек за запрос, но требует ещё и «Управление сервером»
+        if inter.guild.me.guild_permissions.manage_guild:
+            units = [targets[i:i + self.BULK_BAN_CHUNK] for i in range(0, len(targets), self.BULK_BAN_CHUNK)]
+            
+            async def action(unit):
+                result = await inter.guild.bulk_ban(
+                    unit, clean_history_duration=timedelta(days=delete_messages), reason=audit_reason
+                )
+                return [user.id for user in result.banned]
+        else:
+            units = [[target] for target in targets]
+            
+            async def action(unit):
+                await inter.guild.ban(unit[0], reason=audit_reason, delete_message_days=delete_messages)
+                return [unit[0].id]
+        
+        succeeded, failed = await self.run_bulk(inter, "Массовый бан", units, action)
+        await self.finish_bulk(inter, "massban", "🚫 Массовый бан", succeeded, failed, skipped, reason)
+
+    @commands.slash_command(name="masskick", description="Кикнуть сразу многих пользователей (рейд).")
+    @commands.has_permissions(kick_members=True)
+    async def masskick(self, inter: disnake.ApplicationCommandInteraction,
+                       ids: str = commands.Param(description="ID или упоминания через пробел", default=None),
+                       joined_within: str = commands.Param(description="Зашли на сервер за последние (пример: 10м, 1ч)", default=None),
+                       account_younger: str = commands.Param(description="Аккаунт моложе (пример: 1д, 1н)", default=None),
+                       reason: str = commands.Param(description="Причина", default="Рейд")):
+        try:
+            targets, skipped = self.collect_targets(inter, ids, joined_within, account_younger, members_only=True)
+        except ValueError:
+            await inter.response.send_message("❌ Неверный формат времени. Используйте: 1ч, 30м, 2д и т.д.", ephemeral=True)
+            return
+        
+        if not targets:
+            await inter.response.send_message("❌ Нет подходящих участников.", ephemeral=True)
+            return
+        if len(targets) > self.BULK_MAX_TARGETS:
+            await inter.response.send_message(f"❌ Слишком много целей: {len(targets)}. Максимум: {self.BULK_MAX_TARGETS}.", ephemeral=True)
+            return
+        
+        await inter.response.send_message(f"⏳ Массовый кик: 0/{len(targets)}")
+        audit_reason = f"{reason} | Массовый кик | Модератор: {inter.author}"
+        
+        async def action(unit):
+            await unit[0].kick(reason=audit_reason)
+            return [unit[0].id]
+        
+        succeeded, failed = await self.run_bulk(inter, "Массовый кик", [[target] for target in targets], action)
+        await self.finish_bulk(inter, "masskick", "👢 Массовый кик", succeeded, failed, skipped, reason)
+
+    @staticmethod
+    def interaction_alive(inter):
+        """Можно ли ещё редактировать ответ (токен взаимодействия живёт 15 минут)"""
+        return inter.expires_at - disnake.utils.utcnow() > timedelta(seconds=10)
+
+    async def purge_messages(self, inter, channel, amount, check, before=None, after=None):
+        """Удалить до amount подходящих сообщений канала
+        
+        Сообщения моложе 14 дней удаляются пачками по 100 (bulk delete), более
+        старые — по одному в отдельной очереди с паузой CLEAR_SINGLE_DELAY.
+        Просмотр начинается с before (запросом к API) и заканчивается на after.
+        Прогресс раз в пару секунд выводится в исходный ответ, пока жив токен.
+        """
+        bulk_cutoff = disnake.utils.utcnow() - timedelta(days=14) + timedelta(minutes=1)
+        stats = {'scanned': 0, 'bulk': 0, 'single': 0, 'failed': 0}
+        old_messages = asyncio.Queue()
+        
+        # Удаления по одному не должны давать отдельную запись в логах на каждое сообщение
+        logs_cog = self.bot.get_cog('Logs')
+        ignored = logs_cog.ignored_deletes if logs_cog else set()
+        deleted_ids = []
+        
+        async def delete_batch(batch):
+            ids = [message.id for message in batch]
+            ignored.update(ids)
+            deleted_ids.extend(ids)
+            try:
+                await channel.delete_messages(batch)
+                stats['bulk'] += len(batch)
+            except disnake.HTTPException:
+                stats['failed'] += len(batch)
+        
+        async def delete_old():
+            while True:
+                message = await old_messages.get()
+                if message is None:
+                    return
+                ignored.add(message.id)
+                deleted_ids.append(message.id)
+                try:
+                    await message.delete()
+                    stats['single'] += 1
+                except disnake.NotFound:
+                    pass
+                except disnake.HTTPException:
+                    stats['failed'] += 1
+                await asyncio.sleep(self.CLEAR_SINGLE_DELAY)
+        
+        async def report():
+            while self.interaction_alive(inter):
+                await asyncio.sleep(2)
+                try:
+                    await inter.edit_original_response(
+                        content=f"⏳ Очистка: проверено {stats['scanned']}, удалено {stats['bulk'] + stats['single']}, "
+                                f"старых в очереди {old_messages.qsize()}"
+                    )
+                except disnake.HTTPException:
+                    pass
+        
+        old_lane = asyncio.get_running_loop().create_task(delete_old())
+        reporter = asyncio.get_running_loop().create_task(report())
+        try:
+            batch = []
+            matched = 0
+            # after не передаётся в history: от новых к старым disnake отсеял бы старые
+            # сообщения у себя и продолжил листать канал, поэтому просмотр обрываем сами
+            async for message in channel.history(limit=self.CLEAR_SCAN_LIMIT, before=before, oldest_first=False):
+                if after and message.created_at < after:
+                    break
+                stats['scanned'] += 1
+                if not check(message):
+                    continue
+                
+                matched += 1
+                if message.created_at > bulk_cutoff:
+                    batch.append(message)
+                    if len(batch) == 100:
+                        await delete_batch(batch)
+                        batch = []
+                else:
+                    old_messages.put_nowait(message)
+                
+                if matched >= amount:
+                    break
+            
+            if batch:
+                await delete_batch(batch)
+            old_messages.put_nowait(None)
+            await old_lane
+        finally:
+            old_lane.cancel()
+            reporter.cancel()
+            # События удаления приходят чуть позже ответа API
+            asyncio.get_running_loop().call_later(30, ignored.difference_update, deleted_ids)
+        
+        return stats
+
     @commands.slash_command(name="clear", description="Удалить сообщения в канале.")
     @commands.has_permissions(manage_messages=True)
     async def clear(self, inter: disnake.ApplicationCommandInteraction,
-                    amount: int = commands.Param(description="Количество сообщений (1-100)", min_value=1, max_value=100)):
+                    amount: int = commands.Param(description=f"Количество сообщений (1-{CLEAR_MAX})", min_value=1, max_value=CLEAR_MAX),
+                    user: disnake.User = commands.Param(description="Только сообщения этого пользователя", default=None),
+                    contains: str = commands.Param(description="Только сообщения, подходящие под регулярное выражение", default=None, max_length=200),
+                    attachments: bool = commands.Param(description="Только сообщения с вложениями", default=False),
+                    bots: bool = commands.Param(description="Только сообщения ботов", default=False),
+                    newer_than: str = commands.Param(description="Только за последние (пример: 30м, 2ч, 1д)", default=None),
+                    older_than: str = commands.Param(description="Только старше чем (пример: 1д, 1н)", default=None)):
+        
+        try:
+            pattern = re.compile(contains, re.IGNORECASE) if contains else None
+        except re.error:
+            await inter.response.send_message("❌ Неверное регулярное выражение.", ephemeral=True)
+            return
+        
+        try:
+            now = disnake.utils.utcnow()
+            after = now - timedelta(seconds=parse_duration(newer_than)) if newer_than else None
+            before = now - timedelta(seconds=parse_duration(older_than)) if older_than else None
+        except ValueError:
+            await inter.response.send_message("❌ Неверный формат времени. Используйте: 1ч, 30м, 2д и т.д.", ephemeral=True)
+            return
+        
+        filters = []
+        if user:
+            filters.append(f"автор {user.mention}")
+        if pattern:
+            filters.append(f"текст `{contains}`")
+        if attachments:
+            filters.append("с вложениями")
+        if bots:
+            filters.append("от ботов")
+        if newer_than:
+            filters.append(f"за последние {newer_than}")
+        if older_than:
+            filters.append(f"старше {older_than}")
+        
+        def check(message):
+            if user and message.author.id != user.id:
+                return False
+            if bots and not message.author.bot:
+                return False
+            if attachments and not message.attachments:
+                return False
+            if pattern and not pattern.search(message.content):
+                return False
+            return True
         
         await inter.response.defer(ephemeral=True)
         
         try:
-            deleted = await inter.channel.purge(limit=amount)
+            stats = await self.purge_messages(inter, inter.channel, amount, check, before=before, after=after)
+            deleted = stats['bulk'] + stats['single']
+            summary = f"Удалено {deleted} сообщений в {inter.channel.mention}"
+            if filters:
+                summary += f" ({', '.join(filters)})"
             
-            # Логируем в базу данных
+            # Журнал модерации и канал логов
             await self.log_punishment(
-                inter.guild.id, inter.author.id, inter.author.id, "clear", None, f"Удалено {len(deleted)} сообщений"
+                inter.guild.id, inter.author.id, inter.author.id, "clear", None, summary
             )
             
-            # Логируем через систему логов
-            logs_cog = self.bot.get_cog('Logs')
-            if logs_cog:
-                await logs_cog.log_moderation_action(
-                    guild_id=inter.guild.id,
-                    moderator_id=inter.author.id,
-                    user_id=inter.author.id,
-                    action="clear",
-                    reason=f"Удалено {len(deleted)} сообщений в {inter.channel.mention}"
-                )
-            
             embed = disnake.Embed(
                 title="🗑️ Очистка сообщений",
-                description=f"Удалено **{len(deleted)}** сообщений в {inter.channel.mention}",
+                description=f"Удалено **{deleted}** сообщений в {inter.channel.mention}\n"
+                            f"Пачками: {stats['bulk']} | По одному (старше 14 дней): {stats['single']}\n"
+                            f"Проверено: {stats['scanned']} | Ошибок: {stats['failed']}",
                 color=disnake.Color.blue()
             )
+            if filters:
+                embed.add_field(name="Фильтры", value=", ".join(filters)[:1024], inline=False)
             embed.set_footer(text=f"Модератор: {inter.author}")
             
-            await inter.followup.send(embed=embed, ephemeral=True)
-            
-            # Автоудаление через 5 секунд
-            await asyncio.sleep(5)
-            await inter.delete_original_response()
+            if self.interaction_alive(inter):
+                await inter.edit_original_response(content=None, embed=embed)
+                
+                # Автоудаление через 5 секунд
+                await asyncio.sleep(5)
+                await inter.delete_original_response()
+            else:
+                # Долгая очистка пережила токен ответа — итог пишем в сам канал
+                await inter.channel.send(content=inter.author.mention, embed=embed, delete_after=60)
             
         except Exception as e:
-            await inter.followup.send(f"❌ Ошибка: {str(e)}", ephemeral=True)
+            try:
+                if self.interaction_alive(inter):
+                    await inter.followup.send(f"❌ Ошибка: {str(e)}", ephemeral=True)
+                else:
+                    await inter.channel.send(f"{inter.author.mention} ❌ Ошибка очистки: {str(e)}", delete_after=60)
+            except disnake.HTTPException:
+                print(f"❌ Ошибка очистки в {inter.channel.id}: {e}")
 
     @commands.slash_command(name="warn", description="Выдать предупреждение пользователю.")
     @commands.has_permissions(manage_messages=True)
     async def warn(self, inter: disnake.ApplicationCommandInteraction,
                    user: disnake.Member = commands.Param(description="Выберите пользователя."),
-                   reason: str = commands.Param(description="Укажите причину.", default="Не указана")):
+                   reason: str = commands.Param(description="Укажите причину.", default="Не указана"),
+                   duration: str = commands.Param(description="Срок предупреждения (пример: 7д, 2н). Пусто — бессрочно", default=None)):
         
         if user.top_role >= inter.author.top_role:
             await inter.response.send_message("❌ Вы не можете выдать предупреждение этому пользователю.", ephemeral=True)
             return
         
-        warn_id = await self.warn_user(user.id, inter.author.id, reason)
-        warnings_count = await self.get_warnings_count(user.id)
+        try:
+            seconds = parse_duration(duration) if duration else None
+        except ValueError:
+            await inter.response.send_message("❌ Неверный формат времени. Используйте: 1ч, 30м, 2д и т.д.", ephemeral=True)
+            return
         
-        # Логируем в базу данных
-        await self.log_punishment(
-            inter.guild.id, user.id, inter.author.id, "warn", None, reason
-        )
+        warn_id, warnings_count = await self.warn_user(inter.guild.id, user.id, inter.author.id, reason, duration)
+        if seconds:
+            await self.schedule_action(inter.guild.id, user.id, "unwarn", seconds, warn_id)
         
-        # Логируем через систему логов
-        logs_cog = self.bot.get_cog('Logs')
-        if logs_cog:
-            await logs_cog.log_moderation_action(
-                guild_id=inter.guild.id,
-                moderator_id=inter.author.id,
-                user_id=user.id,
-                action="warn",
-                reason=reason
-            )
+        await self.announce(inter.guild.id, user.id, inter.author.id, "warn", duration, reason)
         
         embed = disnake.Embed(
             title="⚠️ Предупреждение выдано",
             description=f"**Пользователь:** {user.mention}\n**Причина:** {reason}\n**Всего предупреждений:** {warnings_count}",
             color=disnake.Color.yellow()
         )
+        if seconds:
+            embed.add_field(name="Истекает", value=f"<t:{int(time.time() + seconds)}:R>")
         embed.set_footer(text=f"ID предупреждения: {warn_id} | Модератор: {inter.author}")
         
-        await inter.response.send_message(embed=embed)
+        message = f"⚠️ Вы получили предупреждение на сервере **{inter.guild.name}**.\n**Причина:** {reason}\n**Всего предупреждений:** {warnings_count}\n**Модератор:** {inter.author}"
+        rule = self.escalations.get(inter.guild.id, {}).get(warnings_count)
+        if rule is None:
+            await inter.response.send_message(embed=embed)
+            self.dms.send(user, message)
+        else:
+            # После бана ЛС уже не дойдёт, поэтому пишем пользователю до эскалации
+            await inter.response.defer()
+            action, rule_duration = rule
+            term = f" на **{rule_duration}**" if rule_duration else ""
+            message += f"\n\n{'🔇 Автоматический мьют' if action == 'mute' else '🚫 Автоматический бан'}{term}."
+            await self.dms.send_within(self.DM_BUDGET, user, message)
+            
+            try:
+                await self.escalate(inter.guild, user, inter.author, warnings_count)
+                value = f"{'🔇 Мьют' if action == 'mute' else '🚫 Бан'} {rule_duration or 'навсегда'}"
+            except Exception as e:
+                value = f"❌ Не удалось: {e}"
+            embed.add_field(name="Эскалация", value=value, inline=False)
+            await inter.followup.send(embed=embed)
+
+    @commands.slash_command(name="escalation", description="Правило: при N предупреждениях выдать мьют или бан.")
+    @commands.has_permissions(administrator=True)
+    async def escalation(self, inter: disnake.ApplicationCommandInteraction,
+                         threshold: int = commands.Param(description="Число активных предупреждений", min_value=1, max_value=100),
+                         action: str = commands.Param(description="Действие (off — удалить правило)", choices=["mute", "ban", "off"]),
+                         duration: str = commands.Param(description="Длительность (пример: 1ч, 1д). Для бана пусто — навсегда", default=None)):
         
-        try:
-            await user.send(f"⚠️ Вы получили предупреждение на сервере **{inter.guild.name}**.\n**Причина:** {reason}\n**Всего предупреждений:** {warnings_count}\n**Модератор:** {inter.author}")
-        except:
-            pass
+        if action == "off":
+            await self.db.execute(
+                "DELETE FROM warn_escalations WHERE guild_id = ? AND threshold = ?", (inter.guild.id, threshold)
+            )
+        else:
+            if action == "mute" and not duration:
+                await inter.response.send_message("❌ Для мьюта укажите длительность.", ephemeral=True)
+                return
+            try:
+                seconds = parse_duration(duration) if duration else None
+            except ValueError:
+                await inter.response.send_message("❌ Неверный формат времени. Используйте: 1ч, 30м, 2д и т.д.", ephemeral=True)
+                return
+            if action == "mute" and seconds > self.MUTE_MAX_SECONDS:
+                await inter.response.send_message("❌ Максимальное время мьюта - 28 суток.", ephemeral=True)
+                return
+            
+            await self.db.execute(
+                "INSERT OR REPLACE INTO warn_escalations (guild_id, threshold, action, duration) VALUES (?, ?, ?, ?)",
+                (inter.guild.id, threshold, action, duration)
+            )
+        
+        await self.load_escalations(inter.guild.id)
+        
+        rules = self.escalations.get(inter.guild.id, {})
+        embed = disnake.Embed(title="📈 Эскалация предупреждений", color=disnake.Color.blue())
+        embed.description = "\n".join(
+            f"**{count}** → {'🔇 мьют' if rule_action == 'mute' else '🚫 бан'} {rule_duration or 'навсегда'}"
+            for count, (rule_action, rule_duration) in sorted(rules.items())
+        ) or "Правил нет."
+        await inter.response.send_message(embed=embed, ephemeral=True)
 
     @commands.slash_command(name="unwarn", description="Снять предупреждение с пользователя.")
     @commands.has_permissions(manage_messages=True)
@@ -438,24 +1065,11 @@ class Moderation(commands.Cog):
                      warn_id: int = commands.Param(description="ID предупреждения (оставьте пустым для последнего)", default=None),
                      reason: str = commands.Param(description="Причина", default="Не указана")):
         
-        success = await self.unwarn_user(user.id, True, warn_id)
+        journal_reason = f"{reason} | Warn ID: {warn_id or 'last'}"
+        success = await self.unwarn_user(inter.guild.id, user.id, True, warn_id, inter.author.id, journal_reason)
         
         if success:
-            # Логируем в базу данных
-            await self.log_punishment(
-                inter.guild.id, user.id, inter.author.id, "unwarn", None, f"{reason} | Warn ID: {warn_id or 'last'}"
-            )
-            
-            # Логируем через систему логов
-            logs_cog = self.bot.get_cog('Logs')
-            if logs_cog:
-                await logs_cog.log_moderation_action(
-                    guild_id=inter.guild.id,
-                    moderator_id=inter.author.id,
-                    user_id=user.id,
-                    action="unwarn",
-                    reason=reason
-                )
+            await self.announce(inter.guild.id, user.id, inter.author.id, "unwarn", None, journal_reason)
             
             embed = disnake.Embed(
                 title="✅ Предупреждение снято",
@@ -473,90 +1087,165 @@ class Moderation(commands.Cog):
     @commands.slash_command(name="warnings", description="Посмотреть предупреждения пользователя.")
     @commands.has_permissions(manage_messages=True)
     async def warnings(self, inter: disnake.ApplicationCommandInteraction,
-                       user: disnake.Member = commands.Param(description="Выберите пользователя.")):
+                       user: disnake.User = commands.Param(description="Выберите пользователя (можно по ID)."),
+                       moderator: disnake.Member = commands.Param(description="Только выданные этим модератором", default=None),
+                       since: str = commands.Param(description="С даты (ГГГГ-ММ-ДД)", default=None),
+                       until: str = commands.Param(description="По дату включительно (ГГГГ-ММ-ДД)", default=None)):
         
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute(
-                """SELECT id, moderator_id, reason, time FROM warnings 
-                WHERE user_id = ? AND active = 'true' ORDER BY time DESC""", 
-                (user.id,)
-            )
-            warnings = await cursor.fetchall()
-            await cursor.close()
+        await self.send_history(inter, "w", user, None, moderator, since, until)
+
+    @commands.slash_command(name="punishments", description="История наказаний пользователя.")
+    @commands.has_permissions(manage_messages=True)
+    async def punishments(self, inter: disnake.ApplicationCommandInteraction,
+                          user: disnake.User = commands.Param(description="Выберите пользователя (можно по ID)."),
+                          action: str = commands.Param(description="Только этот тип наказания", default=None,
+                                                       choices=list(ACTION_EMOJI)),
+                          moderator: disnake.Member = commands.Param(description="Только выданные этим модератором", default=None),
+                          since: str = commands.Param(description="С даты (ГГГГ-ММ-ДД)", default=None),
+                          until: str = commands.Param(description="По дату включительно (ГГГГ-ММ-ДД)", default=None)):
         
-        if not warnings:
-            embed = disnake.Embed(
-                title=f"Предупреждения {user.display_name}",
-                description="✅ Нет активных предупреждений",
-                color=disnake.Color.green()
-            )
-            await inter.response.send_message(embed=embed)
+        await self.send_history(inter, "p", user, action, moderator, since, until)
+
+    # ============= ИСТОРИЯ =============
+    async def send_history(self, inter, kind, user, action, moderator, since, until):
+        """Первая страница /warnings или /punishments"""
+        try:
+            for day in (since, until):
+                if day:
+                    datetime.datetime.strptime(day, "%Y-%m-%d")
+        except ValueError:
+            await inter.response.send_message("❌ Неверный формат даты. Используйте ГГГГ-ММ-ДД.", ephemeral=True)
             return
         
-        embed = disnake.Embed(
-            title=f"Предупреждения {user.display_name}",
-            description=f"Всего активных предупреждений: **{len(warnings)}**",
-            color=disnake.Color.orange()
-        )
+        filters = {
+            'action': action,
+            'moderator_id': moderator.id if moderator else None,
+            'since': since,
+            'until': until
+        }
+        title = f"{'Предупреждения' if kind == 'w' else 'Наказания'} {user.display_name}"
+        embed, components = await self.build_history_page(inter.guild.id, kind, user.id, filters, title)
+        await inter.response.send_message(embed=embed, components=components)
+
+    async def fetch_history_page(self, kind, guild_id, user_id, filters, cursor=None, newer=False):
+        """Страница истории по ключу (time, id); вернуть (строки от новых к старым, есть ли ещё в ту же сторону)"""
+        if kind == "w":
+            sql = "SELECT id, 'warn', moderator_id, NULL, reason, time FROM warnings WHERE guild_id = ? AND user_id = ? AND active = 'true'"
+            table = "warnings"
+        else:
+            sql = "SELECT id, action_type, moderator_id, duration, reason, time FROM punishments WHERE guild_id = ? AND user_id = ?"
+            table = "punishments"
+        params = [guild_id, user_id]
         
-        for warn_id, moderator_id, reason, time in warnings[:10]:
-            moderator = inter.guild.get_member(moderator_id) or f"ID: {moderator_id}"
-            embed.add_field(
-                name=f"ID: {warn_id} | {time}",
-                value=f"**Модератор:** {moderator}\n**Причина:** {reason}",
-                inline=False
-            )
+        if filters['action'] and kind == "p":
+            sql += " AND action_type = ?"
+            params.append(filters['action'])
+        if filters['moderator_id']:
+            sql += " AND moderator_id = ?"
+            params.append(filters['moderator_id'])
+        if filters['since']:
+            sql += " AND time >= ?"
+            params.append(filters['since'])
+        if filters['until']:
+            sql += " AND time < date(?, '+1 day')"
+            params.append(filters['until'])
         
-        await inter.response.send_message(embed=embed)
-
-    @commands.slash_command(name="punishments", description="История наказаний пользователя.")
-    @commands.has_permissions(manage_messages=True)
-    async def punishments(self, inter: disnake.ApplicationCommandInteraction,
-                          user: disnake.Member = commands.Param(description="Выберите пользователя.")):
+        # Курсор — id крайней записи страницы, её (time, id) берём по первичному ключу
+        if cursor:
+            sql += f" AND (time, id) {'>' if newer else '<'} (SELECT time, id FROM {table} WHERE id = ?)"
+            params.append(cursor)
+        sql += " ORDER BY time ASC, id ASC LIMIT ?" if newer else " ORDER BY time DESC, id DESC LIMIT ?"
+        params.append(self.HISTORY_PAGE_SIZE + 1)
         
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute(
-                """SELECT action_type, moderator_id, duration, reason, time FROM punishments 
-                WHERE user_id = ? AND guild_id = ? ORDER BY time DESC LIMIT 20""", 
-                (user.id, inter.guild.id)
-            )
-            punishments = await cursor.fetchall()
-            await cursor.close()
+        rows = await self.db.fetchall(sql, params)
+        more = len(rows) > self.HISTORY_PAGE_SIZE
+        rows = rows[:self.HISTORY_PAGE_SIZE]
+        if newer:
+            rows.reverse()
+        return rows, more
+
+    async def build_history_page(self, guild_id, kind, user_id, filters, title, cursor=None, newer=False, page=1):
+        """Собрать embed страницы и кнопки листания"""
+        rows, more = await self.fetch_history_page(kind, guild_id, user_id, filters, cursor, newer)
+        if newer:
+            # Долистали до самых новых — это снова первая страница
+            page = max(page, 2) if more else 1
+        has_newer = more if newer else cursor is not None
+        has_older = cursor is not None if newer else more
         
-        if not punishments:
-            embed = disnake.Embed(
-                title=f"Наказания {user.display_name}",
-                description="📝 Нет записей о наказаниях",
-                color=disnake.Color.blue()
-            )
-            await inter.response.send_message(embed=embed)
-            return
+        embed = disnake.Embed(title=title, color=disnake.Color.orange() if kind == "w" else disnake.Color.blue())
+        if kind == "w":
+            warnings_count = await self.get_warnings_count(guild_id, user_id)
+            embed.description = f"Всего активных предупреждений: **{warnings_count}**" if rows else "✅ Нет активных предупреждений"
+            if not rows:
+                embed.color = disnake.Color.green()
+        elif not rows:
+            embed.description = "📝 Нет записей о наказаниях"
         
-        embed = disnake.Embed(
-            title=f"Наказания {user.display_name}",
-            description=f"Всего записей: **{len(punishments)}**",
-            color=disnake.Color.blue()
-        )
+        active_filters = []
+        if filters['action'] and kind == "p":
+            active_filters.append(filters['action'])
+        if filters['moderator_id']:
+            active_filters.append(f"<@{filters['moderator_id']}>")
+        if filters['since'] or filters['until']:
+            active_filters.append(f"{filters['since'] or '…'} — {filters['until'] or '…'}")
+        if active_filters:
+            embed.description = f"{embed.description or ''}\n**Фильтр:** {', '.join(active_filters)}".strip()
         
-        for action_type, moderator_id, duration, reason, time in punishments:
-            moderator = inter.guild.get_member(moderator_id) or f"ID: {moderator_id}"
-            action_emoji = {
-                "mute": "🔇", "unmute": "🔊", "kick": "👢", 
-                "ban": "🚫", "unban": "✅", "warn": "⚠️", 
-                "unwarn": "✅", "clear": "🗑️"
-            }.get(action_type, "📝")
-            
-            value = f"**Модератор:** {moderator}\n**Причина:** {reason}"
+        # Модераторы — упоминаниями: Discord сам подставит имена, без запросов на каждую строку
+        for entry_id, action_type, moderator_id, duration, reason, created in rows:
+            value = f"**Модератор:** <@{moderator_id}>\n**Причина:** {reason}"
             if duration:
                 value += f"\n**Длительность:** {duration}"
-            
-            embed.add_field(
-                name=f"{action_emoji} {action_type.upper()} | {time}",
-                value=value,
-                inline=False
+            if kind == "w":
+                name = f"ID: {entry_id} | {created}"
+            else:
+                name = f"{ACTION_EMOJI.get(action_type, '📝')} {action_type.upper()} | {created}"
+            embed.add_field(name=name, value=value, inline=False)
+        
+        if not rows or not (has_newer or has_older):
+            return embed, []
+        
+        embed.set_footer(text=f"Страница {page}")
+        context = self.encode_history_context(kind, user_id, filters)
+        components = [
+            disnake.ui.Button(
+                label="◀ Новее", style=disnake.ButtonStyle.secondary, disabled=not has_newer,
+                custom_id=f"{self.HISTORY_PREFIX}{context}:n:{rows[0][0]}:{page - 1}"
+            ),
+            disnake.ui.Button(
+                label="Старше ▶", style=disnake.ButtonStyle.secondary, disabled=not has_older,
+                custom_id=f"{self.HISTORY_PREFIX}{context}:o:{rows[-1][0]}:{page + 1}"
             )
+        ]
+        return embed, components
+
+    @staticmethod
+    def encode_history_context(kind, user_id, filters):
+        """Вид истории, пользователь и фильтры в custom_id (лимит 100 символов)"""
+        since = (filters['since'] or "").replace("-", "")
+        until = (filters['until'] or "").replace("-", "")
+        return ":".join((kind, str(user_id), filters['action'] or "", str(filters['moderator_id'] or ""), since, until))
+
+    async def handle_history_page(self, inter: disnake.MessageInteraction, rest: str):
+        """Кнопки листания /warnings и /punishments"""
+        if not inter.author.guild_permissions.manage_messages:
+            await inter.response.send_message("❌ Листать историю могут только модераторы.", ephemeral=True)
+            return
         
-        await inter.response.send_message(embed=embed)
+        kind, user_id, action, moderator_id, since, until, direction, cursor, page = rest.split(":")
+        filters = {
+            'action': action or None,
+            'moderator_id': int(moderator_id) if moderator_id else None,
+            'since': f"{since[:4]}-{since[4:6]}-{since[6:]}" if since else None,
+            'until': f"{until[:4]}-{until[4:6]}-{until[6:]}" if until else None
+        }
+        title = inter.message.embeds[0].title if inter.message.embeds else None
+        embed, components = await self.build_history_page(
+            inter.guild.id, kind, int(user_id), filters, title,
+            cursor=int(cursor), newer=direction == "n", page=max(int(page), 1)
+        )
+        await inter.response.edit_message(embed=embed, components=components)
 
     @commands.Cog.listener()
     async def on_message(self, message):
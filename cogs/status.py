@@ -0,0 +1,39 @@
+import disnake
+from disnake.ext import commands
+import datetime
+
+class Status(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.slash_command(name="status", description="Состояние очередей и кешей бота")
+    @commands.has_permissions(administrator=True)
+    async def status(self, inter: disnake.ApplicationCommandInteraction):
+        embed = disnake.Embed(
+            title="📊 Состояние бота",
+            color=disnake.Color.blurple(),
+            timestamp=datetime.datetime.utcnow()
+        )
+        embed.add_field(name="Задержка шлюза", value=f"{self.bot.latency * 1000:.0f} мс", inline=False)
+
+        # Каждый ког может отдать свою статистику через stats()
+        for cog in self.bot.cogs.values():
+            if cog is self or not hasattr(cog, "stats"):
+                continue
+            try:
+                stats = cog.stats()
+            except Exception as e:
+                stats = {"Ошибка": str(e)}
+
+            value = "\n".join(f"**{name}:** {value}" for name, value in stats.items())
+            embed.add_field(name=cog.__class__.__name__, value=value[:1024] or "—", inline=False)
+
+        router = getattr(self.bot, "router", None)
+        if router:
+            value = "\n".join(f"**{name}:** {value}" for name, value in router.stats().items())
+            embed.add_field(name="Маршрутизатор компонентов", value=value[:1024], inline=False)
+
+        await inter.response.send_message(embed=embed, ephemeral=True)
+
+def setup(bot):
+    bot.add_cog(Status(bot))
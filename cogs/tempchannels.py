@@ -1,20 +1,35 @@
 import disnake
 from disnake.ext import commands
-from disnake.ui import Modal, TextInput
-import aiosqlite
+from disnake.ui import TextInput
 import asyncio
+import time
 
 class TempVoices(commands.Cog):
+    # Сколько каналов удаляется одновременно при сверке
+    RECONCILE_CONCURRENCY = 5
+    # Префиксы custom_id передачи владения, после них идёт creator_id канала
+    OWNER_SELECT_PREFIX = "tempvoice_owner_select:"
+    OWNER_MODAL_PREFIX = "tempvoice_owner_modal:"
+
     def __init__(self, bot):
         self.bot = bot
-        self.path = "dbs/file.db"
-
-    async def init_db(self):
-        async with aiosqlite.connect(self.path) as db:
-
-            await db.execute("PRAGMA journal_mode=WAL")
+        self.db = bot.db
+        # guild_id -> настройки временных каналов из tempchannels
+        self.setups = {}
+        # Живые временные каналы; tempvoiceusers — постоянное хранилище
+        self.registry = TempVoiceRegistry()
+        self.last_reconcile = None
+        
+        bot.router.register("lock", self.handle_lock)
+        bot.router.register("give_ownership", self.handle_give_ownership)
+        bot.router.register_prefix(self.OWNER_SELECT_PREFIX, self.handle_owner_select)
+        bot.router.register_prefix(self.OWNER_MODAL_PREFIX, self.handle_owner_modal)
 
+    def cog_unload(self):
+        self.bot.router.unregister_owner(self)
 
+    async def init_db(self):
+        async with self.db.write() as db:
             await db.execute("""CREATE TABLE IF NOT EXISTS tempchannels (
                             guild_id INTEGER PRIMARY KEY,
                             category_id INTEGER DEFAULT NULL,
@@ -32,344 +47,487 @@ class TempVoices(commands.Cog):
                              banned_users_ids TEXT DEFAULT NULL,
                              deafened_users_ids TEXT DEFAULT NULL
                              )""")
-            await db.commit()
+        await self.db.add_column("tempvoiceusers", "guild_id", "INTEGER DEFAULT NULL")
+
+        rows = await self.db.fetchall("SELECT guild_id, category_id, settings_channel_id, mother_channel_id FROM tempchannels")
+        self.setups = {
+            guild_id: {
+                'category_id': category_id,
+                'settings_channel_id': settings_channel_id,
+                'mother_channel_id': mother_channel_id
+            }
+            for guild_id, category_id, settings_channel_id, mother_channel_id in rows
+        }
+
+        rows = await self.db.fetchall(f"SELECT {', '.join(TempVoiceRegistry.COLUMNS)} FROM tempvoiceusers")
+        self.registry.load(rows)
+
+        # init_db вызывается на каждый on_ready — сверяем каналы при запуске и переподключении
+        await self.reconcile_channels()
 
     async def edit_settings(self, creator_id, **kwargs):
-        async with aiosqlite.connect(self.path) as db:
-            # Обновляем только переданные поля
-            if kwargs:
-                set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
-                values = list(kwargs.values())
-                values.append(creator_id)
-                await db.execute(f"UPDATE tempvoiceusers SET {set_clause} WHERE creator_id = ?", values)
-                await db.commit()
-
-    async def create_temp_voice(self, creator_id, channel_id, owner_id=None, **kwargs):
-        async with aiosqlite.connect(self.path) as db:
-            owner_id = owner_id or creator_id
-            await db.execute("""INSERT OR REPLACE INTO tempvoiceusers 
-                              (creator_id, channel_id, owner_id, max_users, is_private, name, bitrate, banned_users_ids, deafened_users_ids) 
-                              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", 
-                            (creator_id, channel_id, owner_id, 
-                             kwargs.get('max_users'), kwargs.get('is_private', 'true'),
-                             kwargs.get('name'), kwargs.get('bitrate', 64000),
-                             kwargs.get('banned_users_ids'), kwargs.get('deafened_users_ids')))
-            await db.commit()
-
-    async def get_temp_voice(self, creator_id):
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute("SELECT * FROM tempvoiceusers WHERE creator_id = ?", (creator_id,))
-            voice = await cursor.fetchone()
-            await cursor.close()
-            return voice
-
-    async def delete_empty_channels(self):
-        for guild in self.bot.guilds:
-            async with aiosqlite.connect(self.path) as db:
-                cursor = await db.execute("SELECT channel_id FROM tempvoiceusers")
-                channels = await cursor.fetchall()
-                await cursor.close()
-                
-                for channel_data in channels:
-                    channel_id = channel_data[0]
-                    channel = guild.get_channel(channel_id)
-                    if channel and hasattr(channel, 'members'):
-                        if len(channel.members) == 0:
-                            await channel.delete()
-                            await db.execute("DELETE FROM tempvoiceusers WHERE channel_id = ?", (channel_id,))
-                await db.commit()
+        # Обновляем только переданные поля
+        if kwargs:
+            set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
+            values = list(kwargs.values())
+            values.append(creator_id)
+            await self.db.execute(f"UPDATE tempvoiceusers SET {set_clause} WHERE creator_id = ?", values)
+            self.registry.update(creator_id, **kwargs)
+
+    async def create_temp_voice(self, guild_id, creator_id, channel_id, owner_id=None, **kwargs):
+        record = {
+            'guild_id': guild_id,
+            'creator_id': creator_id,
+            'channel_id': channel_id,
+            'owner_id': owner_id or creator_id,
+            'max_users': kwargs.get('max_users'),
+            'is_private': kwargs.get('is_private', 'true'),
+            'name': kwargs.get('name'),
+            'bitrate': kwargs.get('bitrate', 64000),
+            'banned_users_ids': kwargs.get('banned_users_ids'),
+            'deafened_users_ids': kwargs.get('deafened_users_ids')
+        }
+        await self.db.execute(f"""INSERT OR REPLACE INTO tempvoiceusers 
+                          ({', '.join(TempVoiceRegistry.COLUMNS)}) 
+                          VALUES ({', '.join('?' * len(TempVoiceRegistry.COLUMNS))})""", 
+                        tuple(record[column] for column in TempVoiceRegistry.COLUMNS))
+        self.registry.add(record)
+
+    async def delete_temp_voice(self, creator_id):
+        await self.db.execute("DELETE FROM tempvoiceusers WHERE creator_id = ?", (creator_id,))
+        self.registry.remove(creator_id)
+
+    def get_temp_voice(self, creator_id):
+        return self.registry.by_creator.get(creator_id)
+
+    def get_owned_voice(self, member):
+        """Временный канал, которым управляет участник (предпочтительно тот, где он сейчас)"""
+        if member.voice and member.voice.channel:
+            record = self.registry.by_channel.get(member.voice.channel.id)
+            if record and record['owner_id'] == member.id:
+                return record
+        return self.registry.get_by_owner(member.id)
+
+    async def reconcile_channels(self):
+        """Сверить записи с реальными каналами: убрать записи удалённых каналов и удалить пустые"""
+        started = time.monotonic()
+        checked = len(self.registry)
+        all_available = all(not guild.unavailable for guild in self.bot.guilds)
+        # Пока список серверов не получен, отсутствие сервера ничего не значит
+        guilds_known = self.bot.is_ready()
+
+        stale = []     # записи, чей канал больше не существует
+        backfill = []  # старые записи без guild_id
+        empty = {}     # guild_id -> [(запись, канал)]
+
+        for record in list(self.registry.by_creator.values()):
+            if record['guild_id']:
+                guild = self.bot.get_guild(record['guild_id'])
+                if guild is None:
+                    if not guilds_known:
+                        continue
+                    # Бота больше нет на сервере — запись устарела
+                    stale.append(record)
+                    continue
+                if guild.unavailable:
+                    continue  # сервер временно недоступен — не трогаем запись
+                channel = guild.get_channel(record['channel_id'])
+            else:
+                channel = self.bot.get_channel(record['channel_id'])
+                if channel is None and not all_available:
+                    continue
+                if channel is not None:
+                    backfill.append((channel.guild.id, record['creator_id']))
+
+            if channel is None:
+                stale.append(record)
+            elif hasattr(channel, 'members') and not channel.members:
+                empty.setdefault(channel.guild.id, []).append((record, channel))
+
+        semaphore = asyncio.Semaphore(self.RECONCILE_CONCURRENCY)
+
+        async def delete_channel(record, channel):
+            async with semaphore:
+                try:
+                    await channel.delete(reason="Пустой временный канал")
+                except disnake.NotFound:
+                    pass
+                except disnake.HTTPException as e:
+                    print(f"❌ Не удалось удалить временный канал {channel.id}: {e}")
+                    return None
+                return record
+
+        deleted = await asyncio.gather(*(
+            delete_channel(record, channel)
+            for channels in empty.values()
+            for record, channel in channels
+        ))
+        removed = stale + [record for record in deleted if record]
+
+        if removed or backfill:
+            async with self.db.write() as db:
+                await db.executemany(
+                    "UPDATE tempvoiceusers SET guild_id = ? WHERE creator_id = ?", backfill
+                )
+                await db.executemany(
+                    "DELETE FROM tempvoiceusers WHERE creator_id = ?",
+                    [(record['creator_id'],) for record in removed]
+                )
+        for guild_id, creator_id in backfill:
+            self.registry.update(creator_id, guild_id=guild_id)
+        for record in removed:
+            self.registry.remove(record['creator_id'])
+
+        elapsed = time.monotonic() - started
+        self.last_reconcile = {
+            'checked': checked,
+            'stale': len(stale),
+            'deleted': len(removed) - len(stale),
+            'guilds': len(empty),
+            'elapsed': elapsed
+        }
+        print(f"🔄 Временные каналы сверены: записей {self.last_reconcile['checked']}, "
+              f"удалено пустых {self.last_reconcile['deleted']}, устаревших {len(stale)} "
+              f"за {elapsed:.2f} с")
+
+    def stats(self):
+        stats = {
+            "Живых временных каналов": len(self.registry),
+            "Серверов с сетапом": len(self.setups),
+        }
+        if self.last_reconcile:
+            stats["Последняя сверка"] = (
+                f"{self.last_reconcile['checked']} записей, удалено {self.last_reconcile['deleted']} "
+                f"+ {self.last_reconcile['stale']} устаревших за {self.last_reconcile['elapsed']:.2f} с"
+            )
+        return stats
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
         if before.channel is None and after.channel is not None:
-            async with aiosqlite.connect(self.path) as db:
-                cursor = await db.execute("SELECT category_id, mother_channel_id FROM tempchannels WHERE guild_id = ?", (member.guild.id,))
-                setup = await cursor.fetchone()
-                await cursor.close()
+            setup = self.setups.get(member.guild.id)
+            
+            if setup and after.channel.id == setup['mother_channel_id']:
+                # Создаем временный канал
+                category = member.guild.get_channel(setup['category_id']) if setup['category_id'] else None
+                tempvoice = await member.guild.create_voice_channel(
+                    f"🔊・{member.display_name}",
+                    category=category
+                )
+                await self.create_temp_voice(member.guild.id, member.id, tempvoice.id, owner_id=member.id)
+                await member.move_to(tempvoice)
                 
-                if setup and after.channel.id == setup[1]:
-                    # Создаем временный канал
-                    category = member.guild.get_channel(setup[0]) if setup[0] else None
-                    tempvoice = await member.guild.create_voice_channel(
-                        f"🔊・{member.display_name}",
-                        category=category
+                # Даем права создателю
+                await tempvoice.set_permissions(member, connect=True, speak=True, view_channel=True)
+                
+                # Логируем создание временного канала
+                logs_cog = self.bot.get_cog('Logs')
+                if logs_cog:
+                    await logs_cog.log_tempvoice_action(
+                        guild_id=member.guild.id,
+                        user_id=member.id,
+                        action="tempvoice_create",
+                        channel_id=tempvoice.id,
+                        extra_info=f"Название: {tempvoice.name}"
                     )
-                    await self.create_temp_voice(member.id, tempvoice.id, owner_id=member.id)
-                    await member.move_to(tempvoice)
-                    
-                    # Даем права создателю
-                    await tempvoice.set_permissions(member, connect=True, speak=True, view_channel=True)
-                    
-                    # Логируем создание временного канала
+        
+        # Проверяем пустые каналы
+        if before.channel and before.channel != after.channel:
+            if len(before.channel.members) == 0:
+                voice = self.registry.by_channel.get(before.channel.id)
+                
+                if voice:
+                    # Логируем удаление временного канала
                     logs_cog = self.bot.get_cog('Logs')
                     if logs_cog:
                         await logs_cog.log_tempvoice_action(
                             guild_id=member.guild.id,
-                            user_id=member.id,
-                            action="tempvoice_create",
-                            channel_id=tempvoice.id,
-                            extra_info=f"Название: {tempvoice.name}"
+                            user_id=voice['creator_id'],
+                            action="tempvoice_delete",
+                            channel_id=before.channel.id,
+                            extra_info=f"Название: {before.channel.name}"
                         )
-        
-        # Проверяем пустые каналы
-        if before.channel and before.channel != after.channel:
-            if len(before.channel.members) == 0:
-                async with aiosqlite.connect(self.path) as db:
-                    cursor = await db.execute("SELECT * FROM tempvoiceusers WHERE channel_id = ?", (before.channel.id,))
-                    voice = await cursor.fetchone()
-                    await cursor.close()
                     
-                    if voice:
-                        # Логируем удаление временного канала
-                        logs_cog = self.bot.get_cog('Logs')
-                        if logs_cog:
-                            await logs_cog.log_tempvoice_action(
-                                guild_id=member.guild.id,
-                                user_id=voice[0],  # creator_id
-                                action="tempvoice_delete",
-                                channel_id=before.channel.id,
-                                extra_info=f"Название: {before.channel.name}"
-                            )
-                        
-                        await before.channel.delete()
-                        await db.execute("DELETE FROM tempvoiceusers WHERE channel_id = ?", (before.channel.id,))
-                        await db.commit()
+                    await before.channel.delete()
+                    await self.delete_temp_voice(voice['creator_id'])
 
     @commands.command(name="tv")
     @commands.has_permissions(administrator=True)
     async def setup(self, ctx):
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute("SELECT * FROM tempchannels WHERE guild_id = ?", (ctx.guild.id,))
-            setup = await cursor.fetchone()
-            await cursor.close()
-            
-            if setup:
-                await ctx.send("✅ Сетап уже сделан.")
-                return
-            
-            message = await ctx.send("""**🛠️ Процесс создания начался.**\n░░░░░░░░░░░░ | 0%""")
-            
-            category = await ctx.guild.create_category("🎵 Временные голосовые каналы")
-            await message.edit(content="""**🛠️ Создание в процессе.**\n███░░░░░░░░░ | 25%""")
-            
-            channel = await ctx.guild.create_text_channel("🎵・настройки", category=category)
-            await message.edit(content="""**🛠️ Создание в процессе.**\n██████░░░░░░ | 50%""")
-            
-            mother_channel = await ctx.guild.create_voice_channel("➕・Создать канал", category=category)
-            await message.edit(content="""**🛠️ Создание в процессе.**\n█████████░░░ | 75%""")
-            
-            await db.execute("""INSERT INTO tempchannels (guild_id, category_id, settings_channel_id, mother_channel_id) 
-                             VALUES (?, ?, ?, ?)""", 
-                           (ctx.guild.id, category.id, channel.id, mother_channel.id))
-            await db.commit()
-            
-            emb = disnake.Embed(
-    title="🎛️ Панель управления голосовым каналом",
-    description="Используйте кнопки ниже для управления вашим временным каналом",
-    color=disnake.Color.blurple()
-)
+        if ctx.guild.id in self.setups:
+            await ctx.send("✅ Сетап уже сделан.")
+            return
+        
+        message = await ctx.send("""**🛠️ Процесс создания начался.**\n░░░░░░░░░░░░ | 0%""")
+        
+        category = await ctx.guild.create_category("🎵 Временные голосовые каналы")
+        await message.edit(content="""**🛠️ Создание в процессе.**\n███░░░░░░░░░ | 25%""")
+        
+        channel = await ctx.guild.create_text_channel("🎵・настройки", category=category)
+        await message.edit(content="""**🛠️ Создание в процессе.**\n██████░░░░░░ | 50%""")
+        
+        mother_channel = await ctx.guild.create_voice_channel("➕・Создать канал", category=category)
+        await message.edit(content="""**🛠️ Создание в процессе.**\n█████████░░░ | 75%""")
+        
+        await self.db.execute("""INSERT INTO tempchannels (guild_id, category_id, settings_channel_id, mother_channel_id) 
+                         VALUES (?, ?, ?, ?)""", 
+                       (ctx.guild.id, category.id, channel.id, mother_channel.id))
+        self.setups[ctx.guild.id] = {
+            'category_id': category.id,
+            'settings_channel_id': channel.id,
+            'mother_channel_id': mother_channel.id
+        }
+        
+        emb = disnake.Embed(
+            title="🎛️ Панель управления голосовым каналом",
+            description="Используйте кнопки ниже для управления вашим временным каналом",
+            color=disnake.Color.blurple()
+        )
 
-            emb.add_field(name="🔇 Мут", value="Заглушить участника", inline=True)
-            emb.add_field(name="❌ Бан", value="Запретить вход", inline=True)
-            emb.add_field(name="👢 Кик", value="Кикнуть из канала", inline=True)
-            emb.add_field(name="🔐 Приватность", value="Открыть / закрыть канал", inline=True)
-            emb.add_field(name="👑 Владелец", value="Передать управление", inline=True)
-            emb.add_field(name="⚙️ Битрейт", value="Изменить качество звука", inline=True)
+        emb.add_field(name="🔇 Мут", value="Заглушить участника", inline=True)
+        emb.add_field(name="❌ Бан", value="Запретить вход", inline=True)
+        emb.add_field(name="👢 Кик", value="Кикнуть из канала", inline=True)
+        emb.add_field(name="🔐 Приватность", value="Открыть / закрыть канал", inline=True)
+        emb.add_field(name="👑 Владелец", value="Передать управление", inline=True)
+        emb.add_field(name="⚙️ Битрейт", value="Изменить качество звука", inline=True)
 
-            emb.set_footer(text="Канал удалится автоматически, когда станет пустым")
+        emb.set_footer(text="Канал удалится автоматически, когда станет пустым")
 
-            
-            view = disnake.ui.View(timeout=None)
-            buttons = [
-                ("🔇", "mute", disnake.ButtonStyle.secondary),
-                ("❌", "ban", disnake.ButtonStyle.secondary),
-                ("👢", "kick", disnake.ButtonStyle.secondary),
-                ("🔐", "lock", disnake.ButtonStyle.secondary),
-                ("👑", "give_ownership", disnake.ButtonStyle.secondary),
-                ("⚙️", "bitrate", disnake.ButtonStyle.secondary),
-            ]
-            
-            for label, custom_id, style in buttons:
-                btn = disnake.ui.Button(label=label, style=style, custom_id=custom_id)
-                view.add_item(btn)
-            
-            await channel.send("@everyone", embed=emb, view=view)
-            await message.edit(content=f"""**✅ Сетап завершён!**\n████████████ | 100%\n
+        buttons = [
+            ("🔇", "mute", disnake.ButtonStyle.secondary),
+            ("❌", "ban", disnake.ButtonStyle.secondary),
+            ("👢", "kick", disnake.ButtonStyle.secondary),
+            ("🔐", "lock", disnake.ButtonStyle.secondary),
+            ("👑", "give_ownership", disnake.ButtonStyle.secondary),
+            ("⚙️", "bitrate", disnake.ButtonStyle.secondary),
+        ]
+        
+        # Без View: нажатия разбирает маршрутизатор по custom_id
+        components = [
+            disnake.ui.Button(label=label, style=style, custom_id=custom_id)
+            for label, custom_id, style in buttons
+        ]
+        
+        await channel.send("@everyone", embed=emb, components=components)
+        await message.edit(content=f"""**✅ Сетап завершён!**\n████████████ | 100%\n
 🔊 Каналы: {channel.mention}, {mother_channel.mention} | Категория: {category.name}""")
 
-    @commands.Cog.listener()
-    async def on_button_click(self, inter: disnake.MessageInteraction):
-        custom_id = inter.component.custom_id
+    async def handle_lock(self, inter: disnake.MessageInteraction):
+        """Кнопка 🔐: открыть или закрыть свой канал"""
+        tempvoice = self.get_owned_voice(inter.author)
+        if not tempvoice:
+            await inter.response.send_message("❌ У вас нет временного канала.", ephemeral=True)
+            return
         
-        if custom_id == "lock":
-            tempvoice = await self.get_temp_voice(inter.author.id)
-            if not tempvoice:
-                await inter.response.send_message("❌ Вы не создали временный канал.", ephemeral=True)
-                return
-            
-            channel = inter.guild.get_channel(tempvoice[1])
-            if not channel:
-                await inter.response.send_message("❌ Канал не найден.", ephemeral=True)
-                return
-            
-            # Логируем действие
-            logs_cog = self.bot.get_cog('Logs')
-            
-            if tempvoice[4] == "true":  # is_private - сейчас открыт, закрываем
-                await channel.set_permissions(inter.guild.default_role, connect=False)
-                await self.edit_settings(inter.author.id, is_private="false")
-                await inter.response.send_message("🔐 Вы закрыли канал.", ephemeral=True)
-                
-                if logs_cog:
-                    await logs_cog.log_tempvoice_action(
-                        guild_id=inter.guild.id,
-                        user_id=inter.author.id,
-                        action="tempvoice_lock",
-                        channel_id=channel.id,
-                        extra_info=f"Канал: {channel.name}"
-                    )
-            else:  # сейчас закрыт, открываем
-                await channel.set_permissions(inter.guild.default_role, connect=True)
-                await self.edit_settings(inter.author.id, is_private="true")
-                await inter.response.send_message("🔓 Вы открыли канал.", ephemeral=True)
-                
-                if logs_cog:
-                    await logs_cog.log_tempvoice_action(
-                        guild_id=inter.guild.id,
-                        user_id=inter.author.id,
-                        action="tempvoice_unlock",
-                        channel_id=channel.id,
-                        extra_info=f"Канал: {channel.name}"
-                    )
+        channel = inter.guild.get_channel(tempvoice['channel_id'])
+        if not channel:
+            await inter.response.send_message("❌ Канал не найден.", ephemeral=True)
+            return
         
-        elif custom_id == "give_ownership":
-            tempvoice = await self.get_temp_voice(inter.author.id)
-            
-            if not tempvoice:
-                await inter.response.send_message("❌ Вы не создали временный канал.", ephemeral=True)
-                return
-            
-            channel = inter.guild.get_channel(tempvoice[1])
-            if not channel or not hasattr(channel, 'members'):
-                await inter.response.send_message("❌ Голосовой канал не найден.", ephemeral=True)
-                return
+        # Логируем действие
+        logs_cog = self.bot.get_cog('Logs')
+        
+        if tempvoice['is_private'] == "true":  # сейчас открыт, закрываем
+            await channel.set_permissions(inter.guild.default_role, connect=False)
+            await self.edit_settings(tempvoice['creator_id'], is_private="false")
+            await inter.response.send_message("🔐 Вы закрыли канал.", ephemeral=True)
             
-            members = channel.members
-            if not members:
-                await inter.response.send_message("❌ Канал пуст.", ephemeral=True)
-                return
+            if logs_cog:
+                await logs_cog.log_tempvoice_action(
+                    guild_id=inter.guild.id,
+                    user_id=inter.author.id,
+                    action="tempvoice_lock",
+                    channel_id=channel.id,
+                    extra_info=f"Канал: {channel.name}"
+                )
+        else:  # сейчас закрыт, открываем
+            await channel.set_permissions(inter.guild.default_role, connect=True)
+            await self.edit_settings(tempvoice['creator_id'], is_private="true")
+            await inter.response.send_message("🔓 Вы открыли канал.", ephemeral=True)
             
-            # Создаем выпадающий список
-            options = []
-            for i, member in enumerate(members[:25]):  # Discord allows max 25 options
-                emoji = "👤"
-                if member.voice:
-                    if member.voice.mute:
-                        emoji = "🔇"
-                    elif member.voice.self_mute:
-                        emoji = "🎙️"
-                    elif member.voice.self_deaf:
-                        emoji = "🎧"
-                
-                options.append(disnake.SelectOption(
-                    label=member.display_name[:100],
-                    value=str(member.id),
-                    emoji=emoji
-                ))
+            if logs_cog:
+                await logs_cog.log_tempvoice_action(
+                    guild_id=inter.guild.id,
+                    user_id=inter.author.id,
+                    action="tempvoice_unlock",
+                    channel_id=channel.id,
+                    extra_info=f"Канал: {channel.name}"
+                )
+
+    async def handle_give_ownership(self, inter: disnake.MessageInteraction):
+        """Кнопка 👑: предложить выбрать нового владельца"""
+        tempvoice = self.get_owned_voice(inter.author)
+        
+        if not tempvoice:
+            await inter.response.send_message("❌ У вас нет временного канала.", ephemeral=True)
+            return
+        
+        channel = inter.guild.get_channel(tempvoice['channel_id'])
+        if not channel or not hasattr(channel, 'members'):
+            await inter.response.send_message("❌ Голосовой канал не найден.", ephemeral=True)
+            return
+        
+        members = channel.members
+        if not members:
+            await inter.response.send_message("❌ Канал пуст.", ephemeral=True)
+            return
+        
+        # Создаем выпадающий список
+        options = []
+        for i, member in enumerate(members[:25]):  # Discord allows max 25 options
+            emoji = "👤"
+            if member.voice:
+                if member.voice.mute:
+                    emoji = "🔇"
+                elif member.voice.self_mute:
+                    emoji = "🎙️"
+                elif member.voice.self_deaf:
+                    emoji = "🎧"
             
-            # Добавляем опцию для ручного ввода
             options.append(disnake.SelectOption(
-                label="Вписать ID вручную",
-                value="manual",
-                emoji="⌨️"
+                label=member.display_name[:100],
+                value=str(member.id),
+                emoji=emoji
             ))
-            
-            select = disnake.ui.Select(
-                placeholder=f"Выберите пользователя ({len(members)} чел.)",
-                options=options,
-                custom_id="select_owner"
-            )
-            
-            async def select_callback(select_inter: disnake.MessageInteraction):
-                if select.values[0] == "manual":
-                    # Модальное окно для ручного ввода ID
-                    modal = Modal(
-                        title="Введите ID пользователя",
-                        custom_id="manual_id_modal"
-                    )
-                    modal.add_item(
-                        TextInput(
-                            label="ID пользователя",
-                            custom_id="user_id",
-                            placeholder="123456789012345678"
-                        )
+        
+        # Добавляем опцию для ручного ввода
+        options.append(disnake.SelectOption(
+            label="Вписать ID вручную",
+            value="manual",
+            emoji="⌨️"
+        ))
+        
+        # Контекст (создатель канала) зашит в custom_id — ответ обработает handle_owner_select
+        select = disnake.ui.Select(
+            placeholder=f"Выберите пользователя ({len(members)} чел.)",
+            options=options,
+            custom_id=f"{self.OWNER_SELECT_PREFIX}{tempvoice['creator_id']}"
+        )
+        
+        await inter.response.send_message("Выберите нового владельца:", components=[select], ephemeral=True)
+
+    async def handle_owner_select(self, inter: disnake.MessageInteraction, creator_id: str):
+        """Выбор нового владельца; creator_id канала берётся из custom_id списка"""
+        creator_id = int(creator_id)
+        if inter.values[0] == "manual":
+            # Модальное окно для ручного ввода ID
+            await inter.response.send_modal(
+                title="Введите ID пользователя",
+                custom_id=f"{self.OWNER_MODAL_PREFIX}{creator_id}",
+                components=[
+                    TextInput(
+                        label="ID пользователя",
+                        custom_id="user_id",
+                        placeholder="123456789012345678"
                     )
-                    await select_inter.response.send_modal(modal)
-                    
-                    try:
-                        modal_inter: disnake.ModalInteraction = await self.bot.wait_for(
-                            "modal_submit",
-                            timeout=60.0,
-                            check=lambda m: m.custom_id == "manual_id_modal" and m.author.id == inter.author.id
-                        )
-                        
-                        user_id = int(modal_inter.text_values["user_id"])
-                        new_owner = inter.guild.get_member(user_id)
-                        
-                        if not new_owner:
-                            await modal_inter.response.send_message("❌ Пользователь не найден.", ephemeral=True)
-                            return
-                        
-                        if new_owner not in members:
-                            await modal_inter.response.send_message("❌ Этот пользователь не в вашем канале.", ephemeral=True)
-                            return
-                        
-                        await self.edit_settings(inter.author.id, owner_id=new_owner.id)
-                        await modal_inter.response.send_message(f"✅ Вы передали владение канала {new_owner.mention}.", ephemeral=True)
-                        
-                        # Логируем передачу владения
-                        logs_cog = self.bot.get_cog('Logs')
-                        if logs_cog:
-                            await logs_cog.log_tempvoice_action(
-                                guild_id=inter.guild.id,
-                                user_id=inter.author.id,
-                                action="tempvoice_transfer",
-                                channel_id=channel.id,
-                                extra_info=f"Новый владелец: {new_owner.mention}"
-                            )
-                        
-                    except ValueError:
-                        await select_inter.followup.send("❌ Неверный ID. Введите числовой ID.", ephemeral=True)
-                    except asyncio.TimeoutError:
-                        await select_inter.followup.send("❌ Время ожидания истекло.", ephemeral=True)
-                
-                else:
-                    new_owner_id = int(select.values[0])
-                    new_owner = inter.guild.get_member(new_owner_id)
-                    
-                    if new_owner and new_owner in members:
-                        await self.edit_settings(inter.author.id, owner_id=new_owner_id)
-                        await select_inter.response.send_message(f"✅ Вы передали владение канала {new_owner.mention}.", ephemeral=True)
-                        
-                        # Логируем передачу владения
-                        logs_cog = self.bot.get_cog('Logs')
-                        if logs_cog:
-                            await logs_cog.log_tempvoice_action(
-                                guild_id=inter.guild.id,
-                                user_id=inter.author.id,
-                                action="tempvoice_transfer",
-                                channel_id=channel.id,
-                                extra_info=f"Новый владелец: {new_owner.mention}"
-                            )
-                    else:
-                        await select_inter.response.send_message("❌ Пользователь не найден или не в канале.", ephemeral=True)
-            
-            select.callback = select_callback
-            
-            view = disnake.ui.View()
-            view.add_item(select)
-            
-            await inter.response.send_message("Выберите нового владельца:", view=view, ephemeral=True)
+                ]
+            )
+        else:
+            await self.transfer_ownership(inter, creator_id, int(inter.values[0]))
+
+    async def handle_owner_modal(self, inter: disnake.ModalInteraction, creator_id: str):
+        """ID нового владельца, введённый вручную"""
+        creator_id = int(creator_id)
+        try:
+            user_id = int(inter.text_values["user_id"])
+        except ValueError:
+            await inter.response.send_message("❌ Неверный ID. Введите числовой ID.", ephemeral=True)
+            return
+        
+        await self.transfer_ownership(inter, creator_id, user_id)
+
+    async def transfer_ownership(self, inter, creator_id, new_owner_id):
+        """Передать владение каналом; всё проверяется заново, ответ мог прийти не сразу"""
+        tempvoice = self.get_temp_voice(creator_id)
+        if not tempvoice or tempvoice['owner_id'] != inter.author.id:
+            await inter.response.send_message("❌ У вас нет временного канала.", ephemeral=True)
+            return
+        
+        channel = inter.guild.get_channel(tempvoice['channel_id'])
+        if not channel or not hasattr(channel, 'members'):
+            await inter.response.send_message("❌ Голосовой канал не найден.", ephemeral=True)
+            return
+        
+        new_owner = inter.guild.get_member(new_owner_id)
+        if not new_owner:
+            await inter.response.send_message("❌ Пользователь не найден.", ephemeral=True)
+            return
+        
+        if new_owner not in channel.members:
+            await inter.response.send_message("❌ Этот пользователь не в вашем канале.", ephemeral=True)
+            return
+        
+        await self.edit_settings(creator_id, owner_id=new_owner.id)
+        await inter.response.send_message(f"✅ Вы передали владение канала {new_owner.mention}.", ephemeral=True)
+        
+        # Логируем передачу владения
+        logs_cog = self.bot.get_cog('Logs')
+        if logs_cog:
+            await logs_cog.log_tempvoice_action(
+                guild_id=inter.guild.id,
+                user_id=inter.author.id,
+                action="tempvoice_transfer",
+                channel_id=channel.id,
+                extra_info=f"Новый владелец: {new_owner.mention}"
+            )
+
+
+class TempVoiceRegistry:
+    """Индекс живых временных каналов по создателю, каналу и владельцу"""
+
+    COLUMNS = ('creator_id', 'channel_id', 'owner_id', 'max_users', 'is_private',
+               'name', 'bitrate', 'banned_users_ids', 'deafened_users_ids', 'guild_id')
+
+    def __init__(self):
+        self.by_creator = {}  # creator_id -> запись
+        self.by_channel = {}  # channel_id -> запись
+        self.by_owner = {}    # owner_id -> {creator_id, ...}
+
+    def __len__(self):
+        return len(self.by_creator)
+
+    def load(self, rows):
+        self.by_creator.clear()
+        self.by_channel.clear()
+        self.by_owner.clear()
+        for row in rows:
+            self.add(dict(zip(self.COLUMNS, row)))
+
+    def add(self, record):
+        self.remove(record['creator_id'])
+        self.by_creator[record['creator_id']] = record
+        if record['channel_id']:
+            self.by_channel[record['channel_id']] = record
+        self.by_owner.setdefault(record['owner_id'], set()).add(record['creator_id'])
+
+    def remove(self, creator_id):
+        record = self.by_creator.pop(creator_id, None)
+        if record is None:
+            return None
+        if self.by_channel.get(record['channel_id']) is record:
+            del self.by_channel[record['channel_id']]
+        owned = self.by_owner.get(record['owner_id'])
+        if owned:
+            owned.discard(creator_id)
+            if not owned:
+                del self.by_owner[record['owner_id']]
+        return record
+
+    def update(self, creator_id, **fields):
+        record = self.by_creator.get(creator_id)
+        if record is None:
+            return
+        # Переиндексируем запись, если меняются ключевые поля
+        self.remove(creator_id)
+        record.update(fields)
+        self.add(record)
+
+    def get_by_owner(self, owner_id):
+        owned = self.by_owner.get(owner_id)
+        if not owned:
+            return None
+        return self.by_creator[next(iter(owned))]
+
 
 def setup(bot):
     bot.add_cog(TempVoices(bot))
@@ -1,26 +1,64 @@
 # tickets.py
 import disnake
 from disnake.ext import commands
-from disnake.ui import Button, View, Modal, TextInput, Select
-import aiosqlite
+from disnake.ui import Button, TextInput
 import asyncio
+import heapq
+import time
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime
-import io
+import hashlib
+import re
+import tempfile
+import zlib
+
+from utils.scheduler import DeadlineScheduler
 
 class TicketSystem(commands.Cog):
+    CONFIG_COLUMNS = ('guild_id', 'category_id', 'create_channel_id', 'create_message_id',
+                      'log_channel_id', 'support_role_id', 'max_tickets_per_user', 'ticket_cooldown',
+                      'require_topic', 'auto_close_hours', 'welcome_message', 'ticket_types',
+                      'pool_size', 'pool_refill_seconds')
+    DEFAULT_TICKET_TYPES = 'general,report,bug,support,other'
+    # Размер несжатого куска транскрипта и порог, после которого файл выгружается на диск
+    TRANSCRIPT_CHUNK_SIZE = 64 * 1024
+    TRANSCRIPT_SPOOL_SIZE = 1024 * 1024
+    # В категории не больше 50 каналов, резерв не должен съедать их все
+    MAX_POOL_SIZE = 10
+    # Окно закрытия тикета, после префикса идёт id канала
+    CLOSE_MODAL_PREFIX = "ticket_close_modal:"
+
     def __init__(self, bot):
         self.bot = bot
-        self.path = "dbs/file.db"
-        self.ticket_cooldowns = {}
-
-    async def init_db(self):
-        async with aiosqlite.connect(self.path) as db:
-
-            await db.execute("PRAGMA journal_mode=WAL")
+        self.db = bot.db
+        self.ticket_cooldowns = TicketCooldowns(self.db)
+        # guild_id -> конфиг тикетов
+        self.configs = {}
+        # channel_id -> ticket_id открытых тикетов, сообщения которых пишутся в ticket_messages
+        self.open_tickets = {}
+        # (guild_id, user_id) -> [блокировка, число ожидающих]
+        self.creation_locks = {}
+        # (число запросов к API, секунды) последних созданий тикетов
+        self.creation_metrics = deque(maxlen=100)
+        # guild_id -> очередь channel_id скрытых каналов в резерве
+        self.pools = {}
+        # guild_id -> задача пополнения резерва
+        self.pool_tasks = {}
+        # channel_id -> срок автозакрытия по неактивности
+        self.auto_close = DeadlineScheduler(self.auto_close_ticket, name="автозакрытие тикетов")
+        
+        bot.router.register("accept_ticket", self.handle_ticket_accept)
+        bot.router.register("close_ticket", self.handle_ticket_close)
+        bot.router.register("transcript_ticket", self.handle_ticket_transcript)
+        bot.router.register_prefix("create_ticket_", self.handle_ticket_create)
+        bot.router.register_prefix(self.CLOSE_MODAL_PREFIX, self.handle_ticket_close_submit)
 
+    def cog_unload(self):
+        self.bot.router.unregister_owner(self)
 
-            await db.execute("PRAGMA foreign_keys = ON")
-            
+    async def init_db(self):
+        async with self.db.write() as db:
             # Таблица тикетов
             await db.execute("""CREATE TABLE IF NOT EXISTS tickets (
                              id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -32,7 +70,8 @@ class TicketSystem(commands.Cog):
                              guild_id INTEGER,
                              ticket_type TEXT DEFAULT 'general',
                              closed_at TEXT DEFAULT NULL,
-                             close_reason TEXT DEFAULT NULL)""")
+                             close_reason TEXT DEFAULT NULL,
+                             history_synced_id INTEGER DEFAULT NULL)""")
             
             # Сообщения в тикетах
             await db.execute("""CREATE TABLE IF NOT EXISTS ticket_messages (
@@ -42,6 +81,11 @@ class TicketSystem(commands.Cog):
                              message TEXT,
                              created_at TEXT,
                              attachments TEXT DEFAULT NULL,
+                             message_id INTEGER DEFAULT NULL,
+                             author_name TEXT DEFAULT NULL,
+                             edited_at TEXT DEFAULT NULL,
+                             deleted INTEGER DEFAULT 0,
+                             changed_at TEXT DEFAULT NULL,
                              FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE)""")
             
             # Транскрипты
@@ -50,8 +94,17 @@ class TicketSystem(commands.Cog):
                              ticket_id INTEGER,
                              content TEXT,
                              created_at TEXT,
+                             chunks TEXT DEFAULT NULL,
+                             content_hash TEXT DEFAULT NULL,
+                             last_message_id INTEGER DEFAULT NULL,
                              FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE)""")
             
+            # Сжатые куски транскриптов, общие для всех снимков
+            await db.execute("""CREATE TABLE IF NOT EXISTS transcript_chunks (
+                             hash TEXT PRIMARY KEY,
+                             data BLOB NOT NULL,
+                             size INTEGER)""")
+            
             # Конфигурация
             await db.execute("""CREATE TABLE IF NOT EXISTS ticket_config (
                              guild_id INTEGER PRIMARY KEY,
@@ -65,7 +118,22 @@ class TicketSystem(commands.Cog):
                              require_topic BOOLEAN DEFAULT 0,
                              auto_close_hours INTEGER DEFAULT 24,
                              welcome_message TEXT DEFAULT 'Спасибо за обращение! Ожидайте ответа модератора.',
-                             ticket_types TEXT DEFAULT 'general,report,bug,support')""")
+                             ticket_types TEXT DEFAULT 'general,report,bug,support',
+                             pool_size INTEGER DEFAULT 0,
+                             pool_refill_seconds INTEGER DEFAULT 10)""")
+            
+            # Резерв заранее созданных каналов
+            await db.execute("""CREATE TABLE IF NOT EXISTS ticket_pool (
+                             channel_id INTEGER PRIMARY KEY,
+                             guild_id INTEGER,
+                             created_at TEXT)""")
+            
+            # Кулдауны создания тикетов (срок окончания в Unix-времени)
+            await db.execute("""CREATE TABLE IF NOT EXISTS ticket_cooldowns (
+                             guild_id INTEGER,
+                             user_id INTEGER,
+                             expires_at REAL,
+                             PRIMARY KEY (guild_id, user_id))""")
             
             # Темы тикетов
             await db.execute("""CREATE TABLE IF NOT EXISTS ticket_topics (
@@ -74,133 +142,339 @@ class TicketSystem(commands.Cog):
                              name TEXT,
                              description TEXT,
                              emoji TEXT DEFAULT '🎫')""")
-            
-            await db.commit()
+
+        await self.db.add_column("tickets", "history_synced_id", "INTEGER DEFAULT NULL")
+        for column, definition in (("message_id", "INTEGER DEFAULT NULL"),
+                                   ("author_name", "TEXT DEFAULT NULL"),
+                                   ("edited_at", "TEXT DEFAULT NULL"),
+                                   ("deleted", "INTEGER DEFAULT 0"),
+                                   ("changed_at", "TEXT DEFAULT NULL")):
+            await self.db.add_column("ticket_messages", column, definition)
+        for column, definition in (("chunks", "TEXT DEFAULT NULL"),
+                                   ("content_hash", "TEXT DEFAULT NULL"),
+                                   ("last_message_id", "INTEGER DEFAULT NULL")):
+            await self.db.add_column("transcripts", column, definition)
+        for column, definition in (("pool_size", "INTEGER DEFAULT 0"),
+                                   ("pool_refill_seconds", "INTEGER DEFAULT 10")):
+            await self.db.add_column("ticket_config", column, definition)
+
+        await self.load_ticket_configs()
+        await self.ticket_cooldowns.load()
+
+        rows = await self.db.fetchall("SELECT channel_id, id FROM tickets WHERE status = 'open'")
+        self.open_tickets = {channel_id: ticket_id for channel_id, ticket_id in rows}
+        
+        await self.restore_auto_close()
+        self.auto_close.start()
+        
+        await self.load_pools()
+
+    async def shutdown(self):
+        for task in list(self.pool_tasks.values()):
+            task.cancel()
+        await self.auto_close.close()
+
+    def stats(self):
+        stats = {
+            "Открытых тикетов": len(self.open_tickets),
+            "Активных кулдаунов": len(self.ticket_cooldowns),
+            "Каналов в резерве": sum(len(pool) for pool in self.pools.values()),
+            "Таймеров автозакрытия": len(self.auto_close),
+            "Закрыто автоматически": self.auto_close.fired,
+        }
+        if self.creation_metrics:
+            calls = sum(metric[0] for metric in self.creation_metrics) / len(self.creation_metrics)
+            latency = sum(metric[1] for metric in self.creation_metrics) / len(self.creation_metrics)
+            stats["Создание тикета (среднее)"] = f"{calls:.1f} запросов к API, {latency:.2f} с"
+        next_due = self.auto_close.next_due
+        if next_due:
+            stats["Ближайшее автозакрытие"] = f"<t:{int(next_due)}:R>"
+        return stats
+
+    async def load_ticket_configs(self, guild_id=None):
+        """Загрузить конфиги в кеш: все сразу или один сервер"""
+        sql = f"SELECT {', '.join(self.CONFIG_COLUMNS)} FROM ticket_config"
+        if guild_id is None:
+            rows = await self.db.fetchall(sql)
+            self.configs = {}
+        else:
+            rows = await self.db.fetchall(sql + " WHERE guild_id = ?", (guild_id,))
+            self.configs.pop(guild_id, None)
+        
+        for row in rows:
+            config = dict(zip(self.CONFIG_COLUMNS, row))
+            config['require_topic'] = bool(config['require_topic'])
+            config['ticket_types'] = config['ticket_types'].split(',') if config['ticket_types'] else ['general']
+            self.configs[config['guild_id']] = config
 
     async def get_ticket_config(self, guild_id):
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute("SELECT * FROM ticket_config WHERE guild_id = ?", (guild_id,))
-            config = await cursor.fetchone()
-            await cursor.close()
-            
-            if config:
-                return {
-                    'guild_id': config[0],
-                    'category_id': config[1],
-                    'create_channel_id': config[2],
-                    'create_message_id': config[3],
-                    'log_channel_id': config[4],
-                    'support_role_id': config[5],
-                    'max_tickets_per_user': config[6],
-                    'ticket_cooldown': config[7],
-                    'require_topic': bool(config[8]),
-                    'auto_close_hours': config[9],
-                    'welcome_message': config[10],
-                    'ticket_types': config[11].split(',') if config[11] else ['general']
-                }
-            
-            # Конфиг по умолчанию
-            default_types = 'general,report,bug,support,other'
-            await db.execute(
-                "INSERT INTO ticket_config (guild_id, ticket_types) VALUES (?, ?)",
-                (guild_id, default_types)
-            )
-            await db.commit()
-            
-            return {
-                'guild_id': guild_id,
-                'category_id': None,
-                'create_channel_id': None,
-                'create_message_id': None,
-                'log_channel_id': None,
-                'support_role_id': None,
-                'max_tickets_per_user': 3,
-                'ticket_cooldown': 300,
-                'require_topic': False,
-                'auto_close_hours': 24,
-                'welcome_message': 'Спасибо за обращение! Ожидайте ответа модератора.',
-                'ticket_types': default_types.split(',')
-            }
+        config = self.configs.get(guild_id)
+        if config:
+            return config
+        
+        # Конфиг по умолчанию (в БД попадёт при первой записи через update_ticket_config)
+        config = {
+            'guild_id': guild_id,
+            'category_id': None,
+            'create_channel_id': None,
+            'create_message_id': None,
+            'log_channel_id': None,
+            'support_role_id': None,
+            'max_tickets_per_user': 3,
+            'ticket_cooldown': 300,
+            'require_topic': False,
+            'auto_close_hours': 24,
+            'welcome_message': 'Спасибо за обращение! Ожидайте ответа модератора.',
+            'ticket_types': self.DEFAULT_TICKET_TYPES.split(','),
+            'pool_size': 0,
+            'pool_refill_seconds': 10
+        }
+        self.configs[guild_id] = config
+        return config
+
+    async def update_ticket_config(self, guild_id, **fields):
+        """Записать поля конфига и сбросить кеш сервера — единственный путь записи в ticket_config"""
+        values = {'ticket_types': self.DEFAULT_TICKET_TYPES, **fields}
+        columns = ", ".join(values)
+        placeholders = ", ".join("?" * len(values))
+        updates = ", ".join(f"{key} = excluded.{key}" for key in fields)
+        await self.db.execute(
+            f"""INSERT INTO ticket_config (guild_id, {columns}) VALUES (?, {placeholders})
+            ON CONFLICT(guild_id) DO UPDATE SET {updates}""",
+            (guild_id, *values.values())
+        )
+        await self.load_ticket_configs(guild_id)
 
     async def get_user_tickets_count(self, guild_id, user_id):
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute(
-                "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND author_id = ? AND status = 'open'",
-                (guild_id, user_id)
-            )
-            count = await cursor.fetchone()
-            await cursor.close()
-            return count[0] if count else 0
+        count = await self.db.fetchone(
+            "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND author_id = ? AND status = 'open'",
+            (guild_id, user_id)
+        )
+        return count[0] if count else 0
 
     async def create_ticket(self, guild_id, author_id, channel_id, ticket_type='general'):
-        async with aiosqlite.connect(self.path) as db:
-            created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cursor = await db.execute(
-                "INSERT INTO tickets (guild_id, author_id, created_at, channel_id, ticket_type) VALUES (?, ?, ?, ?, ?)",
-                (guild_id, author_id, created_at, channel_id, ticket_type)
-            )
-            await db.commit()
-            return cursor.lastrowid
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return await self.db.execute(
+            "INSERT INTO tickets (guild_id, author_id, created_at, channel_id, ticket_type) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, author_id, created_at, channel_id, ticket_type)
+        )
 
     async def close_ticket(self, ticket_id, moderator_id=None, reason="Не указана"):
-        async with aiosqlite.connect(self.path) as db:
-            closed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            await db.execute(
-                "UPDATE tickets SET status = 'closed', moderator_id = ?, closed_at = ?, close_reason = ? WHERE id = ?",
-                (moderator_id, closed_at, reason, ticket_id)
-            )
-            await db.commit()
+        closed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        await self.db.execute(
+            "UPDATE tickets SET status = 'closed', moderator_id = ?, closed_at = ?, close_reason = ? WHERE id = ?",
+            (moderator_id, closed_at, reason, ticket_id)
+        )
 
     async def add_ticket_moderator(self, ticket_id, moderator_id):
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("UPDATE tickets SET moderator_id = ? WHERE id = ?", (moderator_id, ticket_id))
-            await db.commit()
+        await self.db.execute("UPDATE tickets SET moderator_id = ? WHERE id = ?", (moderator_id, ticket_id))
 
-    async def save_transcript(self, ticket_id, channel):
-        """Сохранить транскрипт тикета"""
-        messages = []
+    def message_row(self, ticket_id, message):
+        """Строка ticket_messages для сообщения или None, если в транскрипт оно не попадает"""
+        if message.author.bot and not message.content and not message.embeds:
+            return None
         
-        async for message in channel.history(limit=None, oldest_first=True):
-            if message.author.bot and not message.content and not message.embeds:
-                continue
-                
-            timestamp = message.created_at.strftime("%Y-%m-%d %H:%M:%S")
-            author = f"{message.author.name}#{message.author.discriminator}"
-            
-            content = message.clean_content
-            if not content and message.embeds:
-                content = "[EMBED]"
-            elif not content and message.attachments:
-                content = "[ATTACHMENT]"
-            
-            attachments = ""
-            if message.attachments:
-                attachments = " | Вложения: " + ", ".join([att.filename for att in message.attachments])
+        content = message.clean_content
+        if not content and message.embeds:
+            content = "[EMBED]"
+        elif not content and message.attachments:
+            content = "[ATTACHMENT]"
+        
+        attachments = ", ".join([att.filename for att in message.attachments]) or None
+        return (
+            ticket_id,
+            message.id,
+            message.author.id,
+            f"{message.author.name}#{message.author.discriminator}",
+            content,
+            message.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            attachments
+        )
+
+    async def record_messages(self, rows):
+        await self.db.executemany(
+            """INSERT OR IGNORE INTO ticket_messages
+            (ticket_id, message_id, author_id, author_name, message, created_at, attachments)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            rows
+        )
+
+    async def capture_history_gap(self, ticket_id, channel):
+        """Догрузить из истории канала сообщения, пропущенные живой записью
+        
+        История читается после history_synced_id — последнего сообщения, дочитанного
+        из истории. on_message его не двигает, поэтому сообщения, отправленные пока
+        бот был выключен или до заполнения open_tickets, тоже попадут в транскрипт.
+        """
+        row = await self.db.fetchone("SELECT history_synced_id FROM tickets WHERE id = ?", (ticket_id,))
+        after = disnake.Object(row[0]) if row and row[0] else None
+        
+        rows = []
+        synced_id = None
+        async for message in channel.history(limit=None, after=after, oldest_first=True):
+            message_row = self.message_row(ticket_id, message)
+            if message_row:
+                rows.append(message_row)
+            synced_id = message.id
+            if len(rows) >= 100:
+                await self.record_messages(rows)
+                await self.set_history_synced(ticket_id, synced_id)
+                rows = []
+        if rows:
+            await self.record_messages(rows)
+        if synced_id is not None:
+            await self.set_history_synced(ticket_id, synced_id)
+
+    async def set_history_synced(self, ticket_id, message_id):
+        await self.db.execute("UPDATE tickets SET history_synced_id = ? WHERE id = ?", (message_id, ticket_id))
+
+    async def iter_transcript_lines(self, ticket_id, after=0, page_size=500):
+        """Пары (message_id, строка) транскрипта из ticket_messages, постранично по message_id"""
+        last_id = after
+        while True:
+            rows = await self.db.fetchall(
+                """SELECT message_id, author_name, message, created_at, attachments, edited_at, deleted
+                FROM ticket_messages WHERE ticket_id = ? AND message_id > ?
+                ORDER BY message_id LIMIT ?""",
+                (ticket_id, last_id, page_size)
+            )
+            if not rows:
+                return
             
-            messages.append(f"[{timestamp}] {author}: {content}{attachments}")
+            for message_id, author, content, timestamp, attachments, edited_at, deleted in rows:
+                line = f"[{timestamp}] {author}: {content}"
+                if attachments:
+                    line += f" | Вложения: {attachments}"
+                if deleted:
+                    line += " (удалено)"
+                elif edited_at:
+                    line += " (изменено)"
+                yield message_id, line
+            last_id = rows[-1][0]
+
+    async def store_chunk(self, lines):
+        """Сжать кусок транскрипта и сохранить по хешу содержимого"""
+        data = "".join(f"{line}\n" for line in lines).encode('utf-8')
+        chunk_hash = hashlib.sha256(data).hexdigest()
+        await self.db.execute(
+            "INSERT OR IGNORE INTO transcript_chunks (hash, data, size) VALUES (?, ?, ?)",
+            (chunk_hash, zlib.compress(data), len(data))
+        )
+        return chunk_hash
+
+    async def save_transcript(self, ticket_id, channel):
+        """Сохранить транскрипт тикета, вернуть id записи в transcripts
         
-        transcript_content = "\n".join(messages)
+        Если с прошлого снимка старые сообщения не менялись, дописывается только
+        новый хвост; одинаковые снимки не создают новых записей.
+        """
+        if channel is not None:
+            await self.capture_history_gap(ticket_id, channel)
+        
+        previous = await self.db.fetchone(
+            """SELECT id, chunks, content_hash, last_message_id, created_at FROM transcripts
+            WHERE ticket_id = ? AND chunks IS NOT NULL ORDER BY id DESC LIMIT 1""",
+            (ticket_id,)
+        )
         
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute(
-                "INSERT INTO transcripts (ticket_id, content, created_at) VALUES (?, ?, ?)",
-                (ticket_id, transcript_content, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        chunks = []
+        after = 0
+        if previous:
+            changed = await self.db.fetchone(
+                """SELECT 1 FROM ticket_messages
+                WHERE ticket_id = ? AND message_id <= ? AND changed_at >= ? LIMIT 1""",
+                (ticket_id, previous[3], previous[4])
             )
-            await db.commit()
-        
-        return transcript_content
-
-    async def check_auto_close_tickets(self):
-        """Проверка неактивных тикетов для автозакрытия"""
-        await self.bot.wait_until_ready()
-        while not self.bot.is_closed():
-            try:
-                # Здесь можно добавить логику автозакрытия тикетов
-                pass
-            except Exception as e:
-                print(f"Ошибка в check_auto_close_tickets: {e}")
+            if not changed:
+                chunks = previous[1].split(',') if previous[1] else []
+                after = previous[3] or 0
+        
+        last_message_id = after
+        lines = []
+        size = 0
+        async for message_id, line in self.iter_transcript_lines(ticket_id, after=after):
+            lines.append(line)
+            size += len(line)
+            last_message_id = message_id
+            if size >= self.TRANSCRIPT_CHUNK_SIZE:
+                chunks.append(await self.store_chunk(lines))
+                lines = []
+                size = 0
+        if lines:
+            chunks.append(await self.store_chunk(lines))
+        
+        content_hash = hashlib.sha256(",".join(chunks).encode()).hexdigest()
+        if previous and previous[2] == content_hash:
+            return previous[0]
+        
+        return await self.db.execute(
+            """INSERT INTO transcripts (ticket_id, created_at, chunks, content_hash, last_message_id)
+            VALUES (?, ?, ?, ?, ?)""",
+            (ticket_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ",".join(chunks), content_hash, last_message_id)
+        )
+
+    async def open_transcript(self, transcript_id):
+        """Файл с текстом транскрипта: куски распаковываются по одному прямо в файл"""
+        row = await self.db.fetchone("SELECT content, chunks FROM transcripts WHERE id = ?", (transcript_id,))
+        fp = tempfile.SpooledTemporaryFile(max_size=self.TRANSCRIPT_SPOOL_SIZE)
+        
+        if row and row[1]:
+            for chunk_hash in row[1].split(','):
+                chunk = await self.db.fetchone("SELECT data FROM transcript_chunks WHERE hash = ?", (chunk_hash,))
+                if chunk:
+                    fp.write(zlib.decompress(chunk[0]))
+        elif row and row[0]:
+            # Старые транскрипты хранились текстом целиком
+            fp.write(row[0].encode('utf-8'))
+        
+        fp.seek(0)
+        return fp
+
+    async def touch_ticket(self, guild_id, channel_id, last_activity=None):
+        """Перенести срок автозакрытия тикета от момента последней активности"""
+        config = await self.get_ticket_config(guild_id)
+        if not config['auto_close_hours']:
+            self.auto_close.cancel(channel_id)
+            return
+        
+        last_activity = last_activity or time.time()
+        self.auto_close.schedule(channel_id, last_activity + config['auto_close_hours'] * 3600)
+
+    async def restore_auto_close(self):
+        """Восстановить сроки автозакрытия открытых тикетов по их последней активности"""
+        rows = await self.db.fetchall(
+            """SELECT t.guild_id, t.channel_id, t.created_at, MAX(m.message_id)
+            FROM tickets t LEFT JOIN ticket_messages m ON m.ticket_id = t.id
+            WHERE t.status = 'open' GROUP BY t.id"""
+        )
+        
+        self.auto_close.clear()
+        for guild_id, channel_id, created_at, last_message_id in rows:
+            last_activity = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S").timestamp()
             
-            await asyncio.sleep(3600)  # Проверка каждый час
+            # Сообщения, пришедшие пока бот был выключен, видны по last_message_id канала
+            channel = self.bot.get_channel(channel_id)
+            for message_id in (last_message_id, getattr(channel, 'last_message_id', None)):
+                if message_id:
+                    last_activity = max(last_activity, disnake.utils.snowflake_time(message_id).timestamp())
+            
+            await self.touch_ticket(guild_id, channel_id, last_activity)
+
+    async def auto_close_ticket(self, channel_id):
+        """Закрыть тикет, срок неактивности которого истёк"""
+        ticket = await self.db.fetchone(
+            "SELECT * FROM tickets WHERE channel_id = ? AND status = 'open'", (channel_id,)
+        )
+        if not ticket:
+            self.open_tickets.pop(channel_id, None)
+            return
+        
+        config = await self.get_ticket_config(ticket[6])
+        channel = self.bot.get_channel(channel_id)
+        await self.finish_ticket(
+            ticket, channel, self.bot.user,
+            f"Автозакрытие: нет активности {config['auto_close_hours']} ч."
+        )
 
     @commands.slash_command(name="ticket_setup", description="Настроить систему тикетов")
     @commands.has_permissions(administrator=True)
@@ -224,16 +498,11 @@ class TicketSystem(commands.Cog):
         )
         
         # Обновляем конфиг
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute(
-                "UPDATE ticket_config SET category_id = ?, create_channel_id = ? WHERE guild_id = ?",
-                (category.id, create_channel.id, inter.guild.id)
-            )
-            await db.commit()
+        await self.update_ticket_config(inter.guild.id, category_id=category.id, create_channel_id=create_channel.id)
         
         # Создаем сообщение с кнопками
         config = await self.get_ticket_config(inter.guild.id)
-        view = TicketCreateView(self.bot, config)
+        components = ticket_create_buttons(config)
         
         embed = disnake.Embed(
             title="🎫 Система поддержки",
@@ -241,96 +510,284 @@ class TicketSystem(commands.Cog):
             color=disnake.Color.blue()
         )
         
-        message = await create_channel.send(embed=embed, view=view)
+        message = await create_channel.send(embed=embed, components=components)
         
         # Сохраняем ID сообщения
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute(
-                "UPDATE ticket_config SET create_message_id = ? WHERE guild_id = ?",
-                (message.id, inter.guild.id)
-            )
-            await db.commit()
+        await self.update_ticket_config(inter.guild.id, create_message_id=message.id)
         
         await inter.followup.send(f"✅ Система тикетов настроена!\nКанал: {create_channel.mention}", ephemeral=True)
 
-    @commands.Cog.listener()
-    async def on_button_click(self, inter: disnake.MessageInteraction):
-        if not inter.component.custom_id.startswith("create_ticket_"):
-            if inter.component.custom_id == "accept_ticket":
-                await self.handle_ticket_accept(inter)
-            elif inter.component.custom_id == "close_ticket":
-                await self.handle_ticket_close(inter)
-            elif inter.component.custom_id == "transcript_ticket":
-                await self.handle_ticket_transcript(inter)
+    @commands.slash_command(name="ticket_pool", description="Резерв заранее созданных каналов для тикетов")
+    @commands.has_permissions(administrator=True)
+    async def ticket_pool(self, inter: disnake.ApplicationCommandInteraction,
+                          size: int = commands.Param(description="Сколько каналов держать в резерве (0 — выключить)",
+                                                     min_value=0, max_value=MAX_POOL_SIZE),
+                          refill_seconds: int = commands.Param(description="Пауза между созданием каналов резерва, с",
+                                                               min_value=1, max_value=3600, default=10)):
+        config = await self.get_ticket_config(inter.guild.id)
+        if not config['category_id']:
+            await inter.response.send_message("❌ Система тикетов не настроена.", ephemeral=True)
             return
         
-        # Создание тикета
-        ticket_type = inter.component.custom_id.replace("create_ticket_", "")
-        await self.handle_ticket_create(inter, ticket_type)
+        await inter.response.defer(ephemeral=True)
+        await self.update_ticket_config(inter.guild.id, pool_size=size, pool_refill_seconds=refill_seconds)
+        
+        # Лишние каналы резерва удаляем сразу
+        pool = self.pools.setdefault(inter.guild.id, deque())
+        while len(pool) > size:
+            channel_id = pool.pop()
+            await self.db.execute("DELETE FROM ticket_pool WHERE channel_id = ?", (channel_id,))
+            channel = inter.guild.get_channel(channel_id)
+            if channel:
+                await channel.delete(reason="Резерв тикетов уменьшен")
+        
+        self.refill_pool(inter.guild.id)
+        await inter.followup.send(
+            f"✅ Резерв тикетов: {size} каналов, пополнение раз в {refill_seconds} с.",
+            ephemeral=True
+        )
 
-    async def handle_ticket_create(self, inter: disnake.MessageInteraction, ticket_type: str):
-        """Обработка создания тикета"""
-        config = await self.get_ticket_config(inter.guild.id)
+    # ============= РЕЗЕРВ КАНАЛОВ =============
+    async def load_pools(self):
+        """Загрузить резерв каналов, забыть удалённые и запустить пополнение"""
+        rows = await self.db.fetchall("SELECT channel_id, guild_id FROM ticket_pool ORDER BY created_at")
         
-        # Проверка кулдауна
-        if inter.author.id in self.ticket_cooldowns:
-            last_ticket = self.ticket_cooldowns[inter.author.id]
-            cooldown = config['ticket_cooldown']
-            elapsed = (datetime.now() - last_ticket).total_seconds()
-            
-            if elapsed < cooldown:
-                remaining = int(cooldown - elapsed)
-                await inter.response.send_message(
-                    f"⏰ Вы сможете создать новый тикет через {remaining} секунд.",
-                    ephemeral=True
-                )
-                return
+        self.pools = {}
+        missing = []
+        for channel_id, guild_id in rows:
+            if self.bot.get_channel(channel_id) is None:
+                missing.append((channel_id,))
+                continue
+            self.pools.setdefault(guild_id, deque()).append(channel_id)
         
-        # Проверка лимита тикетов
-        user_tickets = await self.get_user_tickets_count(inter.guild.id, inter.author.id)
-        if user_tickets >= config['max_tickets_per_user']:
-            await inter.response.send_message(
-                f"❌ У вас уже {user_tickets} открытых тикетов. Максимум: {config['max_tickets_per_user']}.",
-                ephemeral=True
-            )
+        if missing:
+            await self.db.executemany("DELETE FROM ticket_pool WHERE channel_id = ?", missing)
+        
+        for guild_id, config in self.configs.items():
+            if config['pool_size']:
+                self.refill_pool(guild_id)
+
+    def refill_pool(self, guild_id):
+        """Запустить фоновое пополнение резерва, если оно ещё не идёт"""
+        if guild_id in self.pool_tasks or not self.configs.get(guild_id, {}).get('pool_size'):
+            return
+        self.pool_tasks[guild_id] = asyncio.get_running_loop().create_task(self._refill_pool(guild_id))
+
+    async def _refill_pool(self, guild_id):
+        try:
+            while not self.bot.is_closed():
+                config = await self.get_ticket_config(guild_id)
+                pool = self.pools.setdefault(guild_id, deque())
+                guild = self.bot.get_guild(guild_id)
+                category = guild.get_channel(config['category_id']) if guild and config['category_id'] else None
+                if category is None or len(pool) >= config['pool_size']:
+                    return
+                
+                channel = await guild.create_text_channel(
+                    "ticket-reserve",
+                    category=category,
+                    overwrites={
+                        guild.default_role: disnake.PermissionOverwrite(read_messages=False),
+                        guild.me: disnake.PermissionOverwrite(read_messages=True, send_messages=True),
+                    }
+                )
+                await self.db.execute(
+                    "INSERT INTO ticket_pool (channel_id, guild_id, created_at) VALUES (?, ?, ?)",
+                    (channel.id, guild_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                )
+                pool.append(channel.id)
+                
+                # Пауза между созданиями, чтобы не упираться в лимиты API
+                await asyncio.sleep(config['pool_refill_seconds'])
+        except Exception as e:
+            print(f"❌ Ошибка пополнения резерва тикетов ({guild_id}): {e}")
+        finally:
+            self.pool_tasks.pop(guild_id, None)
+
+    async def take_pooled_channel(self, guild, name, topic, overwrites):
+        """Превратить канал из резерва в тикет одним запросом или вернуть None"""
+        pool = self.pools.get(guild.id)
+        try:
+            while pool:
+                channel_id = pool.popleft()
+                await self.db.execute("DELETE FROM ticket_pool WHERE channel_id = ?", (channel_id,))
+                channel = guild.get_channel(channel_id)
+                if channel is None:
+                    continue
+                
+                try:
+                    await channel.edit(name=name, topic=topic, overwrites=overwrites)
+                except disnake.NotFound:
+                    continue
+                return channel
+            return None
+        finally:
+            self.refill_pool(guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        pool = self.pools.get(channel.guild.id)
+        if pool and channel.id in pool:
+            pool.remove(channel.id)
+            await self.db.execute("DELETE FROM ticket_pool WHERE channel_id = ?", (channel.id,))
+            self.refill_pool(channel.guild.id)
+
+    # ============= ЗАПИСЬ СООБЩЕНИЙ ТИКЕТОВ =============
+    @commands.Cog.listener()
+    async def on_message(self, message: disnake.Message):
+        ticket_id = self.open_tickets.get(message.channel.id)
+        if ticket_id is None:
             return
         
-        # Создаем тикет
-        if not config['category_id']:
-            await inter.response.send_message("❌ Система тикетов не настроена.", ephemeral=True)
+        row = self.message_row(ticket_id, message)
+        if row:
+            await self.record_messages([row])
+        
+        if not message.author.bot:
+            await self.touch_ticket(message.guild.id, message.channel.id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: disnake.RawMessageUpdateEvent):
+        if payload.channel_id not in self.open_tickets or "content" not in payload.data:
             return
         
-        category = inter.guild.get_channel(config['category_id'])
-        if not category:
-            await inter.response.send_message("❌ Категория тикетов не найдена.", ephemeral=True)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        await self.db.execute(
+            "UPDATE ticket_messages SET message = ?, edited_at = ?, changed_at = ? WHERE message_id = ?",
+            (self.clean_edited_content(payload), now, now, payload.message_id)
+        )
+
+    def clean_edited_content(self, payload):
+        """Текст изменённого сообщения с упоминаниями в виде имён, как у message.clean_content"""
+        content = payload.data["content"]
+        guild = self.bot.get_guild(payload.guild_id) if payload.guild_id else None
+        mentioned = {int(user["id"]): user.get("global_name") or user["username"]
+                     for user in payload.data.get("mentions", [])}
+        
+        def resolve(match):
+            kind, object_id = match.group(1), int(match.group(2))
+            if kind == "#":
+                channel = guild.get_channel(object_id) if guild else None
+                return f"#{channel.name}" if channel else match.group(0)
+            if kind == "@&":
+                role = guild.get_role(object_id) if guild else None
+                return f"@{role.name}" if role else match.group(0)
+            member = guild.get_member(object_id) if guild else None
+            if member:
+                return f"@{member.display_name}"
+            return f"@{mentioned[object_id]}" if object_id in mentioned else match.group(0)
+        
+        return disnake.utils.escape_mentions(re.sub(r"<(#|@&|@!?)(\d+)>", resolve, content))
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: disnake.RawMessageDeleteEvent):
+        if payload.channel_id not in self.open_tickets:
             return
         
-        await inter.response.defer(ephemeral=True)
+        await self.db.execute(
+            "UPDATE ticket_messages SET deleted = 1, changed_at = ? WHERE message_id = ?",
+            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), payload.message_id)
+        )
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: disnake.RawBulkMessageDeleteEvent):
+        if payload.channel_id not in self.open_tickets:
+            return
         
-        # Создаем канал тикета
-        ticket_channel = await inter.guild.create_text_channel(
-            name=f"ticket-{inter.author.name}-{datetime.now().strftime('%d%m')}",
-            category=category,
-            topic=f"Тикет пользователя {inter.author.name} | Тип: {ticket_type}"
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        await self.db.executemany(
+            "UPDATE ticket_messages SET deleted = 1, changed_at = ? WHERE message_id = ?",
+            [(now, message_id) for message_id in payload.message_ids]
         )
+
+    @asynccontextmanager
+    async def creation_lock(self, guild_id, user_id):
+        """Блокировка создания тикета для (guild_id, user_id); освобождённые блокировки удаляются"""
+        key = (guild_id, user_id)
+        entry = self.creation_locks.get(key)
+        if entry is None:
+            entry = self.creation_locks[key] = [asyncio.Lock(), 0]
         
-        # Настраиваем права
-        await ticket_channel.set_permissions(inter.author, read_messages=True, send_messages=True)
-        await ticket_channel.set_permissions(inter.guild.default_role, read_messages=False)
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.creation_locks[key]
+
+    async def handle_ticket_create(self, inter: disnake.MessageInteraction, ticket_type: str):
+        """Обработка создания тикета"""
+        started = time.monotonic()
+        await inter.response.defer(ephemeral=True)
+        api_calls = 1
         
-        if config['support_role_id']:
-            support_role = inter.guild.get_role(config['support_role_id'])
+        # Повторные нажатия ждут, пока закончится первое, и дальше упираются в кулдаун или лимит
+        async with self.creation_lock(inter.guild.id, inter.author.id):
+            config = await self.get_ticket_config(inter.guild.id)
+            
+            # Проверка кулдауна
+            remaining = self.ticket_cooldowns.remaining(inter.guild.id, inter.author.id)
+            if remaining > 0:
+                await inter.followup.send(
+                    f"⏰ Вы сможете создать новый тикет через {int(remaining) + 1} секунд.",
+                    ephemeral=True
+                )
+                return
+            
+            # Проверка лимита тикетов
+            user_tickets = await self.get_user_tickets_count(inter.guild.id, inter.author.id)
+            if user_tickets >= config['max_tickets_per_user']:
+                await inter.followup.send(
+                    f"❌ У вас уже {user_tickets} открытых тикетов. Максимум: {config['max_tickets_per_user']}.",
+                    ephemeral=True
+                )
+                return
+            
+            # Создаем тикет
+            if not config['category_id']:
+                await inter.followup.send("❌ Система тикетов не настроена.", ephemeral=True)
+                return
+            
+            category = inter.guild.get_channel(config['category_id'])
+            if not category:
+                await inter.followup.send("❌ Категория тикетов не найдена.", ephemeral=True)
+                return
+            
+            # Права задаются сразу при создании, канал ни на миг не виден @everyone
+            overwrites = {
+                inter.guild.default_role: disnake.PermissionOverwrite(read_messages=False),
+                inter.guild.me: disnake.PermissionOverwrite(read_messages=True, send_messages=True),
+                inter.author: disnake.PermissionOverwrite(read_messages=True, send_messages=True),
+            }
+            support_role = inter.guild.get_role(config['support_role_id']) if config['support_role_id'] else None
             if support_role:
-                await ticket_channel.set_permissions(support_role, read_messages=True, send_messages=True)
-        
-        # Создаем запись в БД
-        ticket_id = await self.create_ticket(inter.guild.id, inter.author.id, ticket_channel.id, ticket_type)
-        
-        # Устанавливаем кд
-        self.ticket_cooldowns[inter.author.id] = datetime.now()
+                overwrites[support_role] = disnake.PermissionOverwrite(read_messages=True, send_messages=True)
+            
+            # Берём канал из резерва, а если его нет — создаем канал тикета
+            name = f"ticket-{inter.author.name}-{datetime.now().strftime('%d%m')}"
+            topic = f"Тикет пользователя {inter.author.name} | Тип: {ticket_type}"
+            ticket_channel = await self.take_pooled_channel(inter.guild, name, topic, overwrites)
+            if ticket_channel is None:
+                ticket_channel = await inter.guild.create_text_channel(
+                    name=name,
+                    category=category,
+                    topic=topic,
+                    overwrites=overwrites
+                )
+            api_calls += 1
+            
+            # Создаем запись в БД
+            ticket_id = await self.create_ticket(inter.guild.id, inter.author.id, ticket_channel.id, ticket_type)
+            self.open_tickets[ticket_channel.id] = ticket_id
+            await self.touch_ticket(inter.guild.id, ticket_channel.id)
+            
+            # Устанавливаем кд
+            await self.ticket_cooldowns.start(inter.guild.id, inter.author.id, config['ticket_cooldown'])
         
         # Отправляем приветственное сообщение
-        view = TicketActionsView()
+        components = ticket_action_buttons()
         
         embed = disnake.Embed(
     title=f"🎫 Тикет #{ticket_id}",
@@ -347,15 +804,20 @@ class TicketSystem(commands.Cog):
         embed.add_field(name="👤 Автор", value=inter.author.mention, inline=True)
         embed.add_field(name="📅 Создан", value=datetime.now().strftime("%d.%m.%Y %H:%M"), inline=True)
         embed.add_field(name="🔖 Тип", value=ticket_type.capitalize(), inline=True)
-        embed.set_footer(text="Тикет будет автоматически закрыт через 24 часа неактивности")
+        if config['auto_close_hours']:
+            embed.set_footer(text=f"Тикет будет автоматически закрыт через {config['auto_close_hours']} ч. неактивности")
+        
+        mentions = inter.author.mention
+        if support_role:
+            mentions += f" {support_role.mention}"
         
-        await ticket_channel.send(embed=embed, view=view)
-        await ticket_channel.send(f"{inter.author.mention} {f'<@&{config['support_role_id']}>' if config['support_role_id'] else ''}")
+        await ticket_channel.send(content=mentions, embed=embed, components=components)
         
         await inter.followup.send(
             f"✅ Тикет создан: {ticket_channel.mention}",
             ephemeral=True
         )
+        api_calls += 2
         
         # Логируем создание тикета
         logs_cog = self.bot.get_cog('Logs')
@@ -382,150 +844,159 @@ class TicketSystem(commands.Cog):
                     timestamp=datetime.utcnow()
                 )
                 await log_channel.send(embed=embed)
+                api_calls += 1
+        
+        self.creation_metrics.append((api_calls, time.monotonic() - started))
 
     async def handle_ticket_accept(self, inter: disnake.MessageInteraction):
         """Обработка принятия тикета"""
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute(
-                "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
+        ticket = await self.db.fetchone(
+            "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
+        )
+        
+        if not ticket:
+            await inter.response.send_message("❌ Тикет не найден.", ephemeral=True)
+            return
+        
+        if ticket[5]:  # moderator_id
+            await inter.response.send_message(
+                f"❌ Тикет уже принят пользователем <@{ticket[5]}>.",
+                ephemeral=True
             )
-            ticket = await cursor.fetchone()
-            await cursor.close()
-            
-            if not ticket:
-                await inter.response.send_message("❌ Тикет не найден.", ephemeral=True)
-                return
-            
-            if ticket[5]:  # moderator_id
-                await inter.response.send_message(
-                    f"❌ Тикет уже принят пользователем <@{ticket[5]}>.",
-                    ephemeral=True
-                )
-                return
-            
-            await self.add_ticket_moderator(ticket[0], inter.author.id)
-            
-            embed = disnake.Embed(
-                title="✅ Тикет принят",
-                description=f"Модератор {inter.author.mention} принял тикет.",
-                color=disnake.Color.green()
+            return
+        
+        await self.add_ticket_moderator(ticket[0], inter.author.id)
+        
+        embed = disnake.Embed(
+            title="✅ Тикет принят",
+            description=f"Модератор {inter.author.mention} принял тикет.",
+            color=disnake.Color.green()
+        )
+        await inter.channel.send(embed=embed)
+        
+        await inter.response.send_message("✅ Вы приняли тикет.", ephemeral=True)
+        
+        # Логируем принятие тикета
+        logs_cog = self.bot.get_cog('Logs')
+        if logs_cog:
+            await logs_cog.log_ticket_action(
+                guild_id=inter.guild.id,
+                user_id=inter.author.id,
+                action="ticket_accept",
+                ticket_id=ticket[0],
+                extra_info=f"Модератор: {inter.author.mention}"
             )
-            await inter.channel.send(embed=embed)
-            
-            await inter.response.send_message("✅ Вы приняли тикет.", ephemeral=True)
-            
-            # Логируем принятие тикета
-            logs_cog = self.bot.get_cog('Logs')
-            if logs_cog:
-                await logs_cog.log_ticket_action(
-                    guild_id=inter.guild.id,
-                    user_id=inter.author.id,
-                    action="ticket_accept",
-                    ticket_id=ticket[0],
-                    extra_info=f"Модератор: {inter.author.mention}"
-                )
 
     async def handle_ticket_close(self, inter: disnake.MessageInteraction):
-        """Обработка закрытия тикета"""
-        modal = TicketCloseModal()
-        await inter.response.send_modal(modal)
-        
-        try:
-            modal_inter: disnake.ModalInteraction = await self.bot.wait_for(
-                "modal_submit",
-                timeout=300.0,
-                check=lambda m: m.custom_id == "ticket_close_modal" and m.author.id == inter.author.id
-            )
-            
-            reason = modal_inter.text_values.get("reason", "Не указана")
-            
-            # Получаем информацию о тикете
-            async with aiosqlite.connect(self.path) as db:
-                cursor = await db.execute(
-                    "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
+        """Обработка закрытия тикета: показать окно с причиной"""
+        # Окно без объекта Modal: disnake ничего не хранит, ответ обрабатывает маршрутизатор
+        await inter.response.send_modal(
+            title="Закрытие тикета",
+            custom_id=f"{self.CLOSE_MODAL_PREFIX}{inter.channel.id}",
+            components=[
+                TextInput(
+                    label="Причина закрытия",
+                    placeholder="Укажите причину закрытия тикета...",
+                    custom_id="reason",
+                    style=disnake.TextInputStyle.paragraph,
+                    max_length=500,
+                    required=False
                 )
-                ticket = await cursor.fetchone()
-                await cursor.close()
-                
-                if not ticket:
-                    await modal_inter.response.send_message("❌ Тикет не найден.", ephemeral=True)
-                    return
-                
-                ticket_id = ticket[0]
-                author_id = ticket[1]
-            
-            # Сохраняем транскрипт
-            transcript = await self.save_transcript(ticket_id, inter.channel)
-            
-            # Закрываем тикет в БД
-            await self.close_ticket(ticket_id, inter.author.id, reason)
-            
-            # Уведомляем о закрытии
+            ]
+        )
+
+    async def handle_ticket_close_submit(self, inter: disnake.ModalInteraction, channel_id: str):
+        """Закрытие тикета после отправки окна; канал берётся из custom_id окна"""
+        channel_id = int(channel_id)
+        reason = inter.text_values.get("reason") or "Не указана"
+        
+        # Получаем информацию о тикете
+        ticket = await self.db.fetchone(
+            "SELECT * FROM tickets WHERE channel_id = ? AND status = 'open'", (channel_id,)
+        )
+        
+        if not ticket:
+            await inter.response.send_message("❌ Тикет не найден.", ephemeral=True)
+            return
+        
+        await inter.response.send_message("✅ Тикет будет закрыт через 5 секунд...", ephemeral=True)
+        await self.finish_ticket(ticket, inter.guild.get_channel(channel_id), inter.author, reason)
+
+    async def finish_ticket(self, ticket, channel, closer, reason):
+        """Общий путь закрытия тикета: транскрипт, БД, уведомления и удаление канала"""
+        ticket_id = ticket[0]
+        author_id = ticket[1]
+        channel_id = ticket[4]
+        guild = self.bot.get_guild(ticket[6])
+        
+        # Сохраняем транскрипт
+        transcript_id = await self.save_transcript(ticket_id, channel)
+        
+        # Закрываем тикет в БД
+        await self.close_ticket(ticket_id, closer.id, reason)
+        self.open_tickets.pop(channel_id, None)
+        self.auto_close.cancel(channel_id)
+        
+        # Уведомляем о закрытии
+        if channel:
             embed = disnake.Embed(
                 title="❌ Тикет закрыт",
-                description=f"**Причина:** {reason}\n**Закрыл:** {inter.author.mention}",
+                description=f"**Причина:** {reason}\n**Закрыл:** {closer.mention}",
                 color=disnake.Color.red()
             )
-            await inter.channel.send(embed=embed)
-            
-            await modal_inter.response.send_message("✅ Тикет будет закрыт через 5 секунд...", ephemeral=True)
-            
-            # Отправляем транскрипт создателю тикета
-            try:
-                author = inter.guild.get_member(author_id)
-                if author:
-                    transcript_file = io.BytesIO(transcript.encode('utf-8'))
-                    file = disnake.File(transcript_file, filename=f"ticket-{ticket_id}-transcript.txt")
-                    
-                    embed = disnake.Embed(
-                        title=f"📋 Транскрипт тикета #{ticket_id}",
-                        description=f"**Сервер:** {inter.guild.name}\n**Причина закрытия:** {reason}",
-                        color=disnake.Color.blue()
-                    )
-                    await author.send(embed=embed, file=file)
-            except:
-                pass
-            
-            # Логируем закрытие тикета
-            logs_cog = self.bot.get_cog('Logs')
-            if logs_cog:
-                await logs_cog.log_ticket_action(
-                    guild_id=inter.guild.id,
-                    user_id=inter.author.id,
-                    action="ticket_close",
-                    ticket_id=ticket_id,
-                    extra_info=f"Причина: {reason}"
+            await channel.send(embed=embed)
+        
+        # Отправляем транскрипт создателю тикета
+        try:
+            author = guild.get_member(author_id) if guild else None
+            if author:
+                transcript_file = await self.open_transcript(transcript_id)
+                file = disnake.File(transcript_file, filename=f"ticket-{ticket_id}-transcript.txt")
+                
+                embed = disnake.Embed(
+                    title=f"📋 Транскрипт тикета #{ticket_id}",
+                    description=f"**Сервер:** {guild.name}\n**Причина закрытия:** {reason}",
+                    color=disnake.Color.blue()
                 )
-            
-            # Удаляем канал через 5 секунд
+                await author.send(embed=embed, file=file)
+        except:
+            pass
+        
+        # Логируем закрытие тикета
+        logs_cog = self.bot.get_cog('Logs')
+        if logs_cog:
+            await logs_cog.log_ticket_action(
+                guild_id=ticket[6],
+                user_id=closer.id,
+                action="ticket_close",
+                ticket_id=ticket_id,
+                extra_info=f"Причина: {reason}"
+            )
+        
+        # Удаляем канал через 5 секунд
+        if channel:
             await asyncio.sleep(5)
-            await inter.channel.delete()
-            
-        except asyncio.TimeoutError:
-            await inter.followup.send("❌ Время ожидания истекло.", ephemeral=True)
+            await channel.delete()
 
     async def handle_ticket_transcript(self, inter: disnake.MessageInteraction):
         """Обработка запроса транскрипта"""
         await inter.response.defer(ephemeral=True)
         
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute(
-                "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
-            )
-            ticket = await cursor.fetchone()
-            await cursor.close()
-            
-            if not ticket:
-                await inter.followup.send("❌ Тикет не найден.", ephemeral=True)
-                return
-            
-            ticket_id = ticket[0]
+        ticket = await self.db.fetchone(
+            "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
+        )
+        
+        if not ticket:
+            await inter.followup.send("❌ Тикет не найден.", ephemeral=True)
+            return
+        
+        ticket_id = ticket[0]
         
         # Генерируем транскрипт
-        transcript = await self.save_transcript(ticket_id, inter.channel)
+        transcript_id = await self.save_transcript(ticket_id, inter.channel)
         
         # Отправляем файл
-        transcript_file = io.BytesIO(transcript.encode('utf-8'))
+        transcript_file = await self.open_transcript(transcript_id)
         file = disnake.File(transcript_file, filename=f"ticket-{ticket_id}-transcript.txt")
         
         await inter.followup.send(
@@ -534,82 +1005,95 @@ class TicketSystem(commands.Cog):
             ephemeral=True
         )
 
-class TicketCreateView(View):
-    """View для создания тикета с выбором типа"""
+class TicketCooldowns:
+    """Кулдауны создания тикетов по (guild_id, user_id)
     
-    def __init__(self, bot, config):
-        super().__init__(timeout=None)
-        self.bot = bot
-        self.config = config
-        
-        # Добавляем кнопки для каждого типа тикета
-        for ticket_type in self.config['ticket_types']:
-            emoji = self.get_emoji_for_type(ticket_type)
-            button = Button(
-                label=ticket_type.capitalize(),
-                emoji=emoji,
-                style=disnake.ButtonStyle.primary,
-                custom_id=f"create_ticket_{ticket_type}"
-            )
-            self.add_item(button)
+    В памяти держатся только действующие кулдауны: истёкшие вытесняются по
+    куче сроков при каждом обращении. Каждая запись сразу пишется в
+    ticket_cooldowns, чтобы кулдауны переживали перезапуск.
+    """
     
-    def get_emoji_for_type(self, ticket_type):
-        emojis = {
-            'general': '🎫',
-            'report': '⚠️',
-            'bug': '🐛',
-            'support': '🛠️',
-            'question': '❓',
-            'suggestion': '💡',
-            'other': '📝'
-        }
-        return emojis.get(ticket_type, '🎫')
-
-class TicketActionsView(View):
-    """View для управления тикетом"""
+    def __init__(self, db):
+        self.db = db
+        self.expires = {}
+        self.heap = []
     
-    def __init__(self):
-        super().__init__(timeout=None)
-        
-        accept_button = Button(
-            label="Принять",
-            style=disnake.ButtonStyle.green,
-            custom_id="accept_ticket",
-            emoji="✅"
-        )
-        self.add_item(accept_button)
+    def __len__(self):
+        self.evict()
+        return len(self.expires)
+    
+    def evict(self):
+        now = time.time()
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self.heap)
+            if self.expires.get(key) == expires_at:
+                del self.expires[key]
+    
+    def remaining(self, guild_id, user_id):
+        """Сколько секунд осталось до конца кулдауна (0, если его нет)"""
+        self.evict()
+        expires_at = self.expires.get((guild_id, user_id))
+        return max(expires_at - time.time(), 0) if expires_at else 0
+    
+    def _set(self, key, expires_at):
+        self.expires[key] = expires_at
+        heapq.heappush(self.heap, (expires_at, key))
+    
+    async def load(self):
+        """Загрузить из БД действующие кулдауны, удалив истёкшие"""
+        now = time.time()
+        await self.db.execute("DELETE FROM ticket_cooldowns WHERE expires_at <= ?", (now,))
+        rows = await self.db.fetchall("SELECT guild_id, user_id, expires_at FROM ticket_cooldowns")
         
-        close_button = Button(
-            label="Закрыть",
-            style=disnake.ButtonStyle.red,
-            custom_id="close_ticket",
-            emoji="❌"
-        )
-        self.add_item(close_button)
+        self.expires = {}
+        self.heap = []
+        for guild_id, user_id, expires_at in rows:
+            self._set((guild_id, user_id), expires_at)
+    
+    async def start(self, guild_id, user_id, seconds):
+        if not seconds or seconds <= 0:
+            return
         
-        transcript_button = Button(
-            label="Транскрипт",
-            style=disnake.ButtonStyle.blurple,
-            custom_id="transcript_ticket",
-            emoji="📋"
+        expires_at = time.time() + seconds
+        self._set((guild_id, user_id), expires_at)
+        await self.db.execute(
+            """INSERT INTO ticket_cooldowns (guild_id, user_id, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(guild_id, user_id) DO UPDATE SET expires_at = excluded.expires_at""",
+            (guild_id, user_id, expires_at)
         )
-        self.add_item(transcript_button)
 
-class TicketCloseModal(Modal):
-    """Модальное окно для закрытия тикета"""
-    
-    def __init__(self):
-        components = [
-            TextInput(
-                label="Причина закрытия",
-                placeholder="Укажите причину закрытия тикета...",
-                custom_id="reason",
-                style=disnake.TextInputStyle.paragraph,
-                max_length=500,
-                required=False
-            )
-        ]
-        super().__init__(title="Закрытие тикета", custom_id="ticket_close_modal", components=components)
+# Значки кнопок создания тикета по типу
+TICKET_TYPE_EMOJIS = {
+    'general': '🎫',
+    'report': '⚠️',
+    'bug': '🐛',
+    'support': '🛠️',
+    'question': '❓',
+    'suggestion': '💡',
+    'other': '📝'
+}
+
+# Кнопки отправляются без View: их нажатия разбирает маршрутизатор по custom_id,
+# а disnake не хранит объект на каждое сообщение
+def ticket_create_buttons(config):
+    """Кнопки создания тикета для каждого типа"""
+    return [
+        Button(
+            label=ticket_type.capitalize(),
+            emoji=TICKET_TYPE_EMOJIS.get(ticket_type, '🎫'),
+            style=disnake.ButtonStyle.primary,
+            custom_id=f"create_ticket_{ticket_type}"
+        )
+        for ticket_type in config['ticket_types']
+    ]
+
+def ticket_action_buttons():
+    """Кнопки управления тикетом"""
+    return [
+        Button(label="Принять", style=disnake.ButtonStyle.green, custom_id="accept_ticket", emoji="✅"),
+        Button(label="Закрыть", style=disnake.ButtonStyle.red, custom_id="close_ticket", emoji="❌"),
+        Button(label="Транскрипт", style=disnake.ButtonStyle.blurple, custom_id="transcript_ticket", emoji="📋")
+    ]
 
 def setup(bot):
     bot.add_cog(TicketSystem(bot))
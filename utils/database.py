@@ -0,0 +1,230 @@
+import asyncio
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+# PRAGMA применяются один раз на каждое соединение при открытии
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+)
+
+
+class Database:
+    """Общее подключение к SQLite: одно соединение-писатель и пул читателей"""
+
+    def __init__(self, path: str, readers: int = 4):
+        self.path = path
+        self.readers = readers
+        self._writer = None
+        self._reader_conns = []
+        self._reader_pool = asyncio.Queue()
+        self._write_lock = asyncio.Lock()
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def is_connected(self):
+        return self._writer is not None
+
+    async def _open(self, *pragmas):
+        conn = await aiosqlite.connect(self.path)
+        try:
+            for pragma in pragmas + PRAGMAS:
+                async with conn.execute(pragma) as cursor:
+                    await cursor.fetchall()
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    async def connect(self):
+        """Открыть соединения (повторный вызов ничего не делает)"""
+        if self._writer is not None:
+            return
+
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            writer = await self._open("PRAGMA journal_mode = WAL")
+            try:
+                for _ in range(self.readers):
+                    conn = await self._open("PRAGMA query_only = ON")
+                    self._reader_conns.append(conn)
+                    self._reader_pool.put_nowait(conn)
+            except BaseException:
+                await writer.close()
+                for conn in self._reader_conns:
+                    await conn.close()
+                self._reader_conns.clear()
+                self._reader_pool = asyncio.Queue()
+                raise
+            self._writer = writer
+
+    async def close(self):
+        """Дождаться текущих запросов и закрыть все соединения"""
+        async with self._connect_lock:
+            if self._writer is None:
+                return
+
+            async with self._write_lock:
+                await self._writer.commit()
+                await self._writer.close()
+                self._writer = None
+
+            # Забираем всех читателей из пула, чтобы не закрыть занятое соединение
+            for _ in range(len(self._reader_conns)):
+                conn = await self._reader_pool.get()
+                await conn.close()
+            self._reader_conns.clear()
+
+    @asynccontextmanager
+    async def write(self):
+        """Транзакция на соединении-писателе: commit при выходе, rollback при ошибке"""
+        await self.connect()
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            else:
+                await self._writer.commit()
+
+    @asynccontextmanager
+    async def read(self):
+        """Соединение-читатель из пула"""
+        await self.connect()
+        conn = await self._reader_pool.get()
+        try:
+            yield conn
+        finally:
+            self._reader_pool.put_nowait(conn)
+
+    async def fetchone(self, sql: str, params=()):
+        async with self.read() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def fetchall(self, sql: str, params=()):
+        async with self.read() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+
+    async def execute(self, sql: str, params=()):
+        """Выполнить один пишущий запрос, вернуть lastrowid"""
+        async with self.write() as db:
+            cursor = await db.execute(sql, params)
+            lastrowid = cursor.lastrowid
+            await cursor.close()
+            return lastrowid
+
+    async def executemany(self, sql: str, rows):
+        async with self.write() as db:
+            await db.executemany(sql, rows)
+
+    async def add_column(self, table: str, column: str, definition: str):
+        """Добавить столбец в существующую таблицу, если его ещё нет"""
+        async with self.write() as db:
+            async with db.execute(f"PRAGMA table_info({table})") as cursor:
+                columns = [row[1] for row in await cursor.fetchall()]
+            if column not in columns:
+                await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+class WriteBehindQueue:
+    """Очередь отложенной записи: строки копятся в памяти и пишутся пачками
+
+    Сброс происходит при накоплении batch_size строк или раз в flush_interval
+    секунд. Очередь ограничена max_size; при переполнении действует политика
+    overflow: "drop_oldest" вытесняет самые старые строки, "drop_newest"
+    отбрасывает новые.
+    """
+
+    def __init__(self, db: Database, sql: str, *, batch_size: int = 200,
+                 flush_interval: float = 1.0, max_size: int = 10000,
+                 overflow: str = "drop_oldest", name: str = "queue"):
+        if overflow not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"Неизвестная политика переполнения: {overflow}")
+
+        self.db = db
+        self.sql = sql
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.overflow = overflow
+        self.name = name
+
+        self.dropped = 0
+        self.written = 0
+        self._rows = deque()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._closed = False
+
+    def __len__(self):
+        return len(self._rows)
+
+    def put(self, row) -> bool:
+        """Поставить строку в очередь, не дожидаясь записи"""
+        if self._closed:
+            return False
+
+        if len(self._rows) >= self.max_size:
+            self.dropped += 1
+            if self.overflow == "drop_newest":
+                return False
+            self._rows.popleft()
+
+        self._rows.append(row)
+
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Ошибка записи очереди {self.name}: {e}")
+
+    async def flush(self):
+        """Записать всё накопленное, по batch_size строк на транзакцию"""
+        async with self._flush_lock:
+            while self._rows:
+                batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+                try:
+                    await self.db.executemany(self.sql, batch)
+                except Exception:
+                    self.dropped += len(batch)
+                    raise
+                self.written += len(batch)
+
+    async def close(self):
+        """Остановить фоновую задачу и дописать остаток"""
+        self._closed = True
+        if self._task is not None:
+            # Не отменяем задачу, чтобы не оборвать пачку посреди транзакции
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import disnake
+
+
+class DMDispatcher:
+    """Фоновая отправка личных сообщений
+
+    Каждое сообщение отправляется отдельной задачей, одновременно — не больше
+    concurrency. Ошибки 429/5xx повторяются с растущей паузой. Одинаковое
+    сообщение тому же пользователю в течение dedupe_ttl секунд не отправляется
+    повторно. Пользователи с закрытыми ЛС запоминаются на closed_ttl секунд,
+    и сообщения им не тратят запросы к API.
+    """
+
+    def __init__(self, *, concurrency: int = 3, retries: int = 3, backoff: float = 2.0,
+                 dedupe_ttl: float = 60.0, closed_ttl: float = 6 * 3600,
+                 max_pending: int = 1000, name: str = "dm"):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.dedupe_ttl = dedupe_ttl
+        self.closed_ttl = closed_ttl
+        self.max_pending = max_pending
+        self.name = name
+
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.deduped = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # ключ -> задача отправки (в работе или завершённая не раньше dedupe_ttl назад)
+        self._tasks = {}
+        self._finished = {}
+        # user_id -> до какого времени ЛС считаются закрытыми
+        self._closed_dms = {}
+        self._closed = False
+
+    def __len__(self):
+        return sum(1 for task in self._tasks.values() if not task.done())
+
+    def dms_closed(self, user_id: int) -> bool:
+        until = self._closed_dms.get(user_id)
+        if until is None:
+            return False
+        if until < time.time():
+            del self._closed_dms[user_id]
+            return False
+        return True
+
+    def send(self, user, content: str = None, *, embed: disnake.Embed = None, key=None) -> asyncio.Task:
+        """Поставить сообщение в отправку; задача завершится True, если оно доставлено"""
+        loop = asyncio.get_running_loop()
+        self._prune()
+
+        if key is None:
+            key = (user.id, content, embed.description if embed else None)
+        task = self._tasks.get(key)
+        if task is not None:
+            self.deduped += 1
+            return task
+
+        if self._closed or self.dms_closed(user.id) or len(self) >= self.max_pending:
+            self.skipped += 1
+            task = loop.create_future()
+            task.set_result(False)
+            return task
+
+        task = loop.create_task(self._deliver(user, content, embed))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._finished.setdefault(key, time.time()))
+        return task
+
+    async def send_within(self, budget: float, user, content: str = None, **kwargs) -> bool:
+        """Отправить и подождать не дольше budget секунд; отправка продолжается в фоне"""
+        task = self.send(user, content, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=budget)
+        except asyncio.TimeoutError:
+            return False
+
+    async def _deliver(self, user, content, embed) -> bool:
+        for attempt in range(self.retries + 1):
+            async with self._semaphore:
+                if self.dms_closed(user.id):
+                    self.skipped += 1
+                    return False
+                try:
+                    await user.send(content, embed=embed)
+                    self.sent += 1
+                    return True
+                except disnake.Forbidden:
+                    # ЛС закрыты или нет общих серверов — повтор не поможет
+                    self._closed_dms[user.id] = time.time() + self.closed_ttl
+                    self.failed += 1
+                    return False
+                except disnake.HTTPException as e:
+                    if e.status != 429 and e.status < 500:
+                        self.failed += 1
+                        return False
+                    error = e
+                except (OSError, asyncio.TimeoutError) as e:
+                    error = e
+
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+        self.failed += 1
+        print(f"⚠️ ЛС {self.name} пользователю {user.id} не отправлено: {error}")
+        return False
+
+    def _prune(self):
+        """Забыть завершённые отправки старше dedupe_ttl и истёкшие записи о закрытых ЛС"""
+        now = time.time()
+        expired = now - self.dedupe_ttl
+        for key in [key for key, finished in self._finished.items() if finished < expired]:
+            del self._finished[key]
+            self._tasks.pop(key, None)
+        for user_id in [user_id for user_id, until in self._closed_dms.items() if until < now]:
+            del self._closed_dms[user_id]
+
+    def stats(self):
+        return {
+            "Отправлено": self.sent,
+            "Ошибок": self.failed,
+            "Пропущено": self.skipped,
+            "Дубликатов": self.deduped,
+            "В очереди": len(self),
+            "Закрытых ЛС": len(self._closed_dms)
+        }
+
+    async def close(self, timeout: float = 5.0):
+        """Перестать принимать сообщения и дать отправиться начатым"""
+        self._closed = True
+        pending = [task for task in self._tasks.values() if not task.done()]
+        if not pending:
+            return
+        _, pending = await asyncio.wait(pending, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
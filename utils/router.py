@@ -0,0 +1,93 @@
+import time
+
+
+class InteractionRouter:
+    """Маршрутизация кнопок, выпадающих списков и модальных окон по custom_id
+
+    Точные custom_id ищутся в словаре, префиксы — в префиксном дереве
+    (побеждает самый длинный). Обработчик точного маршрута вызывается как
+    handler(inter), префиксного — как handler(inter, остаток custom_id).
+    Маршруты не привязаны к View, поэтому панели работают и после перезапуска.
+    """
+
+    def __init__(self):
+        self.exact = {}
+        self.trie = {}
+        # маршрут -> {'calls', 'errors', 'total', 'max'}
+        self.metrics = {}
+        self.unrouted = 0
+
+    def register(self, custom_id: str, handler):
+        self.exact[custom_id] = handler
+
+    def register_prefix(self, prefix: str, handler):
+        node = self.trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[None] = (prefix, handler)
+
+    def unregister_owner(self, owner):
+        """Убрать все маршруты, обработчики которых — методы owner (при выгрузке кога)"""
+        def owned(handler):
+            return getattr(handler, "__self__", None) is owner
+
+        self.exact = {key: handler for key, handler in self.exact.items() if not owned(handler)}
+
+        def prune(node):
+            if None in node and owned(node[None][1]):
+                del node[None]
+            for char in [char for char in node if char is not None]:
+                prune(node[char])
+                if not node[char]:
+                    del node[char]
+        prune(self.trie)
+
+    def resolve(self, custom_id: str):
+        """Вернуть (маршрут, обработчик, аргументы) или None"""
+        handler = self.exact.get(custom_id)
+        if handler is not None:
+            return custom_id, handler, ()
+
+        found = None
+        node = self.trie
+        for char in custom_id:
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                found = node[None]
+        if found is None:
+            return None
+
+        prefix, handler = found
+        return f"{prefix}*", handler, (custom_id[len(prefix):],)
+
+    async def dispatch(self, inter):
+        route = self.resolve(inter.data.custom_id)
+        if route is None:
+            self.unrouted += 1
+            return False
+
+        name, handler, args = route
+        metrics = self.metrics.setdefault(name, {'calls': 0, 'errors': 0, 'total': 0.0, 'max': 0.0})
+        started = time.perf_counter()
+        try:
+            await handler(inter, *args)
+        except Exception as e:
+            metrics['errors'] += 1
+            print(f"❌ Ошибка обработчика {name}: {e}")
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics['calls'] += 1
+            metrics['total'] += elapsed
+            metrics['max'] = max(metrics['max'], elapsed)
+        return True
+
+    def stats(self):
+        stats = {}
+        for name, metrics in sorted(self.metrics.items()):
+            average = metrics['total'] / metrics['calls'] * 1000 if metrics['calls'] else 0
+            stats[name] = (f"{metrics['calls']} выз., {metrics['errors']} ошиб., "
+                           f"ср. {average:.0f} мс, макс. {metrics['max'] * 1000:.0f} мс")
+        stats["Без обработчика"] = self.unrouted
+        return stats
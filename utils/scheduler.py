@@ -0,0 +1,145 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class DeadlineScheduler:
+    """Таймеры на куче: одна задача спит до ближайшего срока и вызывает callback(key)
+
+    Сроки задаются временем Unix (time.time()), поэтому их можно хранить в БД.
+    Перенос срока на более поздний не трогает кучу: старая запись всплывёт
+    раньше и будет переложена с новым сроком. Отменённые ключи пропускаются
+    при извлечении. Наступившие ключи выполняют concurrency рабочих задач,
+    поэтому даже тысячи просроченных после простоя сроков не порождают
+    задачу на каждый.
+    """
+
+    def __init__(self, callback, *, name: str = "scheduler", concurrency: int = 5):
+        self.callback = callback
+        self.name = name
+        self.concurrency = concurrency
+
+        self.fired = 0
+        self.failed = 0
+        self._deadlines = {}
+        self._queued = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._workers = []
+        # Наступившие ключи ждут свободного обработчика
+        self._due_queue = asyncio.Queue()
+        self._due_keys = set()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def get(self, key):
+        return self._deadlines.get(key)
+
+    @property
+    def next_due(self):
+        return min(self._deadlines.values(), default=None)
+
+    def schedule(self, key, due: float):
+        """Назначить или перенести срок ключа"""
+        self._deadlines[key] = due
+        if due < self._queued.get(key, float("inf")):
+            self._queued[key] = due
+            heapq.heappush(self._heap, (due, next(self._seq), key))
+            if self._heap[0][2] == key:
+                self._wakeup.set()
+
+    @property
+    def backlog(self):
+        """Сколько наступивших ключей ждут обработчика"""
+        return len(self._due_keys)
+
+    def cancel(self, key):
+        self._deadlines.pop(key, None)
+        self._due_keys.discard(key)
+
+    def clear(self):
+        self._deadlines.clear()
+        self._queued.clear()
+        self._heap.clear()
+        self._due_keys.clear()
+
+    def start(self):
+        """Запустить фоновые задачи (повторный вызов ничего не делает)"""
+        if self._task is None and not self._closed:
+            loop = asyncio.get_running_loop()
+            self._task = loop.create_task(self._run())
+            self._workers = [loop.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def _run(self):
+        while not self._closed:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due, _, key = heapq.heappop(self._heap)
+            if self._queued.get(key) == due:
+                del self._queued[key]
+
+            current = self._deadlines.get(key)
+            if current is None:
+                continue
+            if current > due:
+                # Срок перенесли — возвращаем ключ в кучу с новым сроком
+                if current < self._queued.get(key, float("inf")):
+                    self._queued[key] = current
+                    heapq.heappush(self._heap, (current, next(self._seq), key))
+                continue
+
+            del self._deadlines[key]
+            if key not in self._due_keys:
+                self._due_keys.add(key)
+                self._due_queue.put_nowait(key)
+
+    async def _work(self):
+        while True:
+            key = await self._due_queue.get()
+            if key is None:
+                return
+            if key not in self._due_keys:
+                continue  # отменён, пока ждал обработчика
+            self._due_keys.discard(key)
+            try:
+                await self.callback(key)
+                self.fired += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Ошибка таймера {self.name} ({key}): {e}")
+
+    async def close(self):
+        """Остановить планировщик и дождаться уже запущенных обработчиков
+
+        Ключи, ещё ждущие в очереди, не выполняются: владелец восстановит их
+        из своего хранилища при следующем запуске.
+        """
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._due_keys.clear()
+        for _ in self._workers:
+            self._due_queue.put_nowait(None)
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
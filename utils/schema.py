@@ -0,0 +1,136 @@
+import sqlite3
+
+# Версия набора индексов хранится в PRAGMA user_version.
+# При изменении INDEXES или OBSOLETE_INDEXES увеличьте INDEX_VERSION.
+INDEX_VERSION = 5
+
+# Индексы под горячие запросы когов
+INDEXES = {
+    "idx_tickets_channel": "CREATE INDEX IF NOT EXISTS idx_tickets_channel ON tickets (channel_id)",
+    "idx_tickets_author_status": "CREATE INDEX IF NOT EXISTS idx_tickets_author_status ON tickets (guild_id, author_id, status)",
+    "idx_tempvoiceusers_channel": "CREATE INDEX IF NOT EXISTS idx_tempvoiceusers_channel ON tempvoiceusers (channel_id)",
+    "idx_warnings_guild_user_active": "CREATE INDEX IF NOT EXISTS idx_warnings_guild_user_active ON warnings (guild_id, user_id, active, time)",
+    "idx_punishments_user_guild_time": "CREATE INDEX IF NOT EXISTS idx_punishments_user_guild_time ON punishments (user_id, guild_id, time)",
+    "idx_punishments_guild_time": "CREATE INDEX IF NOT EXISTS idx_punishments_guild_time ON punishments (guild_id, time)",
+    "idx_punishments_moderator": "CREATE INDEX IF NOT EXISTS idx_punishments_moderator ON punishments (moderator_id)",
+    "idx_logs_user": "CREATE INDEX IF NOT EXISTS idx_logs_user ON logs (user_id)",
+    "idx_ticket_messages_message": "CREATE UNIQUE INDEX IF NOT EXISTS idx_ticket_messages_message ON ticket_messages (message_id)",
+    "idx_ticket_messages_ticket": "CREATE INDEX IF NOT EXISTS idx_ticket_messages_ticket ON ticket_messages (ticket_id, message_id)",
+    "idx_scheduled_actions_user": "CREATE INDEX IF NOT EXISTS idx_scheduled_actions_user ON scheduled_actions (guild_id, user_id, action)",
+}
+
+# Индексы из прошлых версий, которые нужно удалить
+OBSOLETE_INDEXES = ("idx_warnings_user_active",)
+
+# Горячие запросы, план которых проверяется при запуске
+HOT_QUERIES = {
+    "tickets по каналу": (
+        "SELECT * FROM tickets WHERE channel_id = ?", (0,)
+    ),
+    "открытые тикеты пользователя": (
+        "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND author_id = ? AND status = 'open'", (0, 0)
+    ),
+    "tempvoiceusers по каналу": (
+        "SELECT * FROM tempvoiceusers WHERE channel_id = ?", (0,)
+    ),
+    "активные предупреждения (счётчик)": (
+        "SELECT active_count FROM warning_counts WHERE guild_id = ? AND user_id = ?", (0, 0)
+    ),
+    "активные предупреждения (страница)": (
+        "SELECT id, 'warn', moderator_id, NULL, reason, time FROM warnings "
+        "WHERE guild_id = ? AND user_id = ? AND active = 'true' "
+        "AND (time, id) < (SELECT time, id FROM warnings WHERE id = ?) ORDER BY time DESC, id DESC LIMIT ?", (0, 0, 0, 11)
+    ),
+    "последнее активное предупреждение": (
+        "SELECT id FROM warnings WHERE guild_id = ? AND user_id = ? AND active = 'true' ORDER BY time DESC, id DESC LIMIT 1", (0, 0)
+    ),
+    "история наказаний (страница)": (
+        "SELECT id, action_type, moderator_id, duration, reason, time FROM punishments "
+        "WHERE guild_id = ? AND user_id = ? AND (time, id) < (SELECT time, id FROM punishments WHERE id = ?) "
+        "ORDER BY time DESC, id DESC LIMIT ?", (0, 0, 0, 11)
+    ),
+    "история наказаний (назад)": (
+        "SELECT id, action_type, moderator_id, duration, reason, time FROM punishments "
+        "WHERE guild_id = ? AND user_id = ? AND (time, id) > (SELECT time, id FROM punishments WHERE id = ?) "
+        "ORDER BY time ASC, id ASC LIMIT ?", (0, 0, 0, 11)
+    ),
+    "логи пользователя": (
+        "SELECT * FROM logs WHERE user_id = ?", (0,)
+    ),
+    "журнал модератора": (
+        "SELECT id FROM punishments WHERE moderator_id = ?", (0,)
+    ),
+    "страница журнала сервера": (
+        "SELECT id, user_id, moderator_id, action_type, duration, reason, time FROM punishments "
+        "WHERE guild_id = ? AND (time, id) > (?, ?) ORDER BY time, id LIMIT ?", (0, "", 0, 100)
+    ),
+    "сообщения тикета по message_id": (
+        "UPDATE ticket_messages SET deleted = 1 WHERE message_id = ?", (0,)
+    ),
+    "отложенные действия пользователя": (
+        "SELECT id FROM scheduled_actions WHERE guild_id = ? AND user_id = ? AND action = ?", (0, 0, "unban")
+    ),
+    "страница транскрипта": (
+        "SELECT message_id, author_name, message, created_at, attachments, edited_at, deleted "
+        "FROM ticket_messages WHERE ticket_id = ? AND message_id > ? ORDER BY message_id LIMIT ?", (0, 0, 500)
+    ),
+}
+
+
+async def ensure_indexes(db):
+    """Создать индексы текущей версии и удалить устаревшие"""
+    row = await db.fetchone("PRAGMA user_version")
+    version = row[0] if row else 0
+    failed = False
+
+    async with db.write() as conn:
+        if version < INDEX_VERSION:
+            for name in OBSOLETE_INDEXES:
+                await conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+        for name, sql in INDEXES.items():
+            try:
+                await conn.execute(sql)
+            except sqlite3.OperationalError as e:
+                failed = True
+                print(f"❌ Индекс {name} не создан: {e}")
+
+        # Версию повышаем только если весь набор создан
+        if not failed and version != INDEX_VERSION:
+            await conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    async with db.write() as conn:
+        await conn.execute("PRAGMA optimize")
+
+    if not failed and version != INDEX_VERSION:
+        print(f"✅ Индексы обновлены до версии {INDEX_VERSION}")
+
+
+async def check_query_plans(db):
+    """Проверить через EXPLAIN QUERY PLAN, что горячие запросы не сканируют таблицы целиком"""
+    problems = []
+
+    for name, (sql, params) in HOT_QUERIES.items():
+        # EXPLAIN не перечитывает схему, поэтому план смотрим на соединении,
+        # которое само создавало индексы
+        try:
+            async with db.write() as conn:
+                async with conn.execute(f"EXPLAIN QUERY PLAN {sql}", params) as cursor:
+                    plan = await cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            problems.append(f"{name}: {e}")
+            continue
+
+        for row in plan:
+            detail = row[3]
+            if (detail.startswith("SCAN") and "USING" not in detail) or "TEMP B-TREE" in detail:
+                problems.append(f"{name}: {detail}")
+
+    if problems:
+        print("⚠️ Запросы без подходящего индекса:")
+        for problem in problems:
+            print(f"   • {problem}")
+    else:
+        print("✅ Все горячие запросы используют индексы")
+
+    return problems